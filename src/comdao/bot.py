@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import html
 from functools import wraps
@@ -19,7 +20,10 @@ from .config.settings import (
     ROLE_NAME,
     BOT,
     DISCORD_PARAMS,
-    ROLE_ID,
+    MONITORING,
+    RETENTION,
+    API,
+    REPLAY,
 )
 from .helpers.substrate_interface import whitelist
 from .helpers.errors import on_application_command_error
@@ -35,26 +39,54 @@ from .helpers.domain_logic import (
     pop_from_whitelist,
     get_votes_threshold,
     build_application_embeds,
+    claim_voting_slot,
+    settle_voting_slot,
+    decision_summary,
+    backfill_applications,
+    build_digest,
+    mark_digested,
+    search_applications,
+    application_status,
 )
-from .db.cache import CACHE
+from .helpers.metrics import track_command, start_metrics_server
+from .helpers.api import start_api_server
+from .helpers.profiling import profile, ProfilerBusy, MAX_PROFILE_SECONDS
+from .db.tenants import TENANTS, GUILD_IDS, Tenant, tenant_for
+from .db.leader import LEASE
+from .config.loggers import LOGGER, correlated
 
 BOT_TOKEN = DISCORD_PARAMS.BOT_TOKEN
-GUILD_ID = DISCORD_PARAMS.GUILD_ID
-REQUEST_CHANNEL_ID = DISCORD_PARAMS.REQUEST_CHANNEL_ID
-NOMINATOR_CHANNEL_ID = DISCORD_PARAMS.NOMINATOR_CHANNEL_ID
 
 
 lock = asyncio.Lock()
+# seconds to profile right after startup, set by `--profile`
+PROFILE_ON_READY = 0
+LEASE_TASK: asyncio.Task[None] | None = None
 
 # Set up logging
 
 BOT.on_application_command_error = on_application_command_error
 
+def has_tenant_role():
+    """`commands.has_role` with the nominator role of the guild's tenant."""
+    def predicate(ctx: Any) -> bool:
+        tenant = tenant_for(ctx.guild)
+        if tenant is None:
+            raise commands.NoPrivateMessage()
+        role_id = tenant.config.ROLE_ID
+        if discord.utils.get(ctx.author.roles, id=role_id) is None:
+            raise commands.MissingRole(role_id)
+        return True
+
+    return commands.check(predicate)
+
+
 def in_nominator_channel():
     def decorator(func):
         @wraps(func)
         async def wrapper(ctx: Any, *args, **kwargs):
-            if ctx.channel.id != NOMINATOR_CHANNEL_ID:
+            tenant = tenant_for(ctx.guild)
+            if tenant is None or ctx.channel.id != tenant.config.NOMINATOR_CHANNEL_ID:
                 await ctx.respond(
                     "This command can only be used in the designated channel.",
                     ephemeral=True,
@@ -70,51 +102,195 @@ def in_nominator_channel():
 # == Discord Bot ==
 @BOT.event
 async def on_ready() -> None:
-    print(f"{BOT.user} is now online!")
+    global LEASE_TASK
+    LOGGER.info(f"{BOT.user} is now online!")
     show_pending_applications.start()
+    if LEASE_TASK is None:
+        LEASE_TASK = asyncio.create_task(LEASE.run(take_over))
+        # needs the running loop to render views, so it starts here
+        if API.PORT:
+            try:
+                start_api_server(API.HOST, API.PORT, asyncio.get_running_loop())
+            except OSError as e:
+                # e.g. another replica on this host already serves the port
+                LOGGER.warning(f"State API disabled, can't bind port {API.PORT}: {e}")
+    if PROFILE_ON_READY:
+        asyncio.create_task(profile_on_startup(PROFILE_ON_READY))
+
+
+@BOT.event
+async def on_interaction(interaction: discord.Interaction) -> None:
+    # every replica receives the interaction, only the leader answers it
+    if not LEASE.is_leader:
+        return
+    await BOT.process_application_commands(interaction)
+
+
+async def take_over() -> None:
+    # the previous leader may have saved or submitted anything up to now
+    for tenant in TENANTS.values():
+        await tenant.cache.reload()
+        tenant.cache.current_whitelist = await asyncio.to_thread(
+            whitelist, tenant.config.USE_TESTNET
+        )
+        await settle_voting_slot(tenant)
+    if show_pending_applications.is_running():
+        # runs once this replica acts as leader, which is right after this
+        show_pending_applications.restart()
+
+
+async def profile_on_startup(seconds: int) -> None:
+    try:
+        report = await profile(seconds)
+    except ProfilerBusy as e:
+        LOGGER.warning(str(e))
+        return
+    LOGGER.info(report.summary(), extra={"dump_path": report.dump_path})
 
 
 @tasks.loop(seconds=600)
+@track_command("show_pending_applications")
 async def show_pending_applications():
-    channel = await BOT.fetch_channel(REQUEST_CHANNEL_ID)  # as integer
-    channel = check_type(channel, discord.channel.TextChannel)
-    guild = BOT.get_guild(GUILD_ID)
+    if not LEASE.is_leader:
+        return
+    # a failing tenant (gone guild, chain errors) doesn't hold back the others
+    results = await asyncio.gather(
+        *(show_tenant_applications(tenant) for tenant in TENANTS.values()),
+        return_exceptions=True,
+    )
+    for tenant, result in zip(TENANTS.values(), results):
+        if isinstance(result, Exception):
+            LOGGER.error(
+                f"Tick of tenant {tenant.name} failed: {result!r}",
+                exc_info=result,
+                extra={"tenant": tenant.name},
+            )
+
+
+def ensure_backfill(tenant: Tenant):
+    task = tenant.backfill_task
+    if task is not None and not task.done():
+        return
+    if task is not None and not task.cancelled() and task.exception():
+        LOGGER.error(
+            f"Backfill of {tenant.name} failed: {task.exception()!r}",
+            extra={"tenant": tenant.name},
+        )
+    if not tenant.cache.backfilling:
+        return
+
+    async def publish_if_idle():
+        # the first backfilled applications are shown without waiting a tick
+        if tenant.cache.app_being_voted is None:
+            await publish_next_application(tenant)
+
+    # the task keeps the correlation id it was created with
+    with correlated("backfill"):
+        tenant.backfill_task = asyncio.create_task(
+            backfill_applications(tenant, on_chunk=publish_if_idle)
+        )
+
+
+async def request_channel(tenant: Tenant) -> discord.TextChannel:
+    channel_id = tenant.config.REQUEST_CHANNEL_ID
+    # the gateway cache spares a REST call
+    channel = BOT.get_channel(channel_id) or await BOT.fetch_channel(channel_id)
+    return check_type(channel, discord.channel.TextChannel)
+
+
+async def post_voting_slot(
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        role: discord.Role,
+        markdown: str,
+        discord_uid: str,
+    ):
+    reply_message = (
+        "Please use the commands `/approve` or `/reject` to vote. "
+        "If the propposal is accepted, " 
+        "the module will be added to the DAO whitelist "
+        "and will be eligible to register on the subnet 0."
+
+    )
+
+    discord_user = guild.get_member(int(discord_uid))
+
+    if discord_user is not None:
+        overwrites = channel.overwrites # type: ignore just one more ignore bro
+        overwrites[discord_user] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+        await channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
+    sent_message: discord.Message = await channel.send(markdown) # type: ignore
+    await sent_message.reply(role.mention + "\n" + reply_message)
+
+
+async def publish_next_application(tenant: Tenant):
+    """Fills a free voting slot from the queue, without reading the chain."""
+    if not LEASE.is_leader:
+        return
+    config = tenant.config
+    guild = BOT.get_guild(config.GUILD_ID)
     assert guild
-    markdown, discord_uid = build_application_embeds(CACHE, guild)
-    # means that we have a new application to be displayed
+    markdown, discord_uid = await claim_voting_slot(tenant, guild)
     if markdown and discord_uid is not None:
-        role = guild.get_role(ROLE_ID)
-        role = check_type(role, discord.Role)
-        reply_message = (
-            "Please use the commands `/approve` or `/reject` to vote. "
-            "If the propposal is accepted, " 
-            "the module will be added to the DAO whitelist "
-            "and will be eligible to register on the subnet 0."
+        role = check_type(guild.get_role(config.ROLE_ID), discord.Role)
+        channel = await request_channel(tenant)
+        await post_voting_slot(guild, channel, role, markdown, discord_uid)
+    await tenant.cache.persist()
+
+
+def schedule_publish(tenant: Tenant):
+    """Publishes the next application once a decision freed the slot."""
+    async def publish():
+        try:
+            await publish_next_application(tenant)
+        except Exception as e:
+            LOGGER.error(
+                f"Publishing for tenant {tenant.name} failed: {e!r}",
+                exc_info=e,
+                extra={"tenant": tenant.name},
+            )
 
-        )
+    tenant.publish_task = asyncio.create_task(publish())
 
-        discord_user = guild.get_member(int(discord_uid))
 
-        if discord_user is not None:
-            overwrites = channel.overwrites # type: ignore just one more ignore bro
-            overwrites[discord_user] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            await channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
-        sent_message: discord.Message = await channel.send(markdown) # type: ignore
-        await sent_message.reply(role.mention + "\n" + reply_message)
-    with CACHE:
-        CACHE.save_to_disk()
+async def show_tenant_applications(tenant: Tenant):
+    ensure_backfill(tenant)
+    config = tenant.config
+    channel = await request_channel(tenant)
+    guild = BOT.get_guild(config.GUILD_ID)
+    assert guild
+    markdown, discord_uid = await build_application_embeds(tenant, guild)
+    digest, digested_ids = await build_digest(tenant, guild)
+    role = guild.get_role(config.ROLE_ID)
+    role = check_type(role, discord.Role)
+    # means that we have a new application to be displayed
+    if markdown and discord_uid is not None:
+        await post_voting_slot(guild, channel, role, markdown, discord_uid)
+    elif digest:
+        # one ping per tick, on the digest when no application took the slot
+        digest[0] = role.mention + "\n" + digest[0]
+    for page in digest:
+        await channel.send(page) # type: ignore
+    if digested_ids:
+        await mark_digested(tenant.cache, digested_ids)
+    await tenant.cache.compact(RETENTION.SECONDS)
+    await tenant.cache.persist()
 
 @BOT.slash_command(
-    guild_ids=[GUILD_ID], description="Help command"  # ! make sure to pass as string
+    guild_ids=GUILD_IDS, description="Help command"  # ! make sure to pass as string
 )
 @commands.cooldown(1, 10, commands.BucketType.user)
+@track_command("help")
 async def help(ctx) -> None:
     help_message = """🚀 **Commune DAO Commands:**
 1. `/approve <ss58 key> <recommended_weight (int 1 ~ 100)>` - Approves a module for whitelist and sets the weight as the median of the weights passed on votes.
 2. `/reject <ss58 key> <reason>` - Rejects a module approval.
 3. `/remove <ss58 key> <reason>` - Vote to remove a module from the whitelist. 
 4. `/stats` - Lists a table of members and their `multisig_participation_count` and `multisig_abscence_count`, ranked by participation.
-5. `/help` - Displays this help message.
+5. `/history <application id or ss58 key>` - Shows how past votes on an application or module were decided.
+6. `/search <words, ss58 key or discord id>` - Finds past and pending applications.
+7. `/status <application id or ss58 key>` - Shows the queue position or live votes of a pending application.
+8. `/help` - Displays this help message.
 
 📝 **Note:** Replace `<parameter>` with the appropriate value when using the commands."""
 
@@ -122,23 +298,27 @@ async def help(ctx) -> None:
 
 
 @BOT.slash_command(
-    guild_ids=[GUILD_ID],  # ! make sure to pass as string
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
     description="Lists member stats based on multisig participation.",
     name="stats"
 )
 @commands.cooldown(1, 10, commands.BucketType.user)
+@track_command("stats")
 async def stats(ctx: discord.ApplicationContext) -> None:
     guild = ctx.guild
     assert guild
+    tenant = tenant_for(guild)
+    assert tenant
+    cache = tenant.cache
     #role: discord.Role = discord.utils.get(guild.roles, name=ROLE_NAME)
-    role = guild.get_role(ROLE_ID)
+    role = guild.get_role(tenant.config.ROLE_ID)
     role = check_type(role, discord.Role)
     members = role.members
     stats_data = get_member_stats(
         members, 
-        CACHE.nomination_approvals.keys(), 
-        CACHE.removal_approvals.keys(), 
-        CACHE.rejection_approvals.keys()
+        cache.nomination_approvals.keys(), 
+        cache.removal_approvals.keys(), 
+        cache.rejection_approvals.keys()
         )
 
     # Sort the stats data based on multisig participation count in descending order
@@ -156,14 +336,89 @@ async def stats(ctx: discord.ApplicationContext) -> None:
 
 
 @BOT.slash_command(
-    guild_ids=[GUILD_ID],  # ! make sure to pass as string
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
+    description="Shows past decisions on an application or module.",
+    name="history"
+)
+@commands.cooldown(1, 10, commands.BucketType.user)
+@track_command("history")
+async def history(
+    ctx: discord.ApplicationContext,
+    subject: Option(str, description="Application ID or module key"),
+    ) -> None:
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    subject = subject.strip()
+    if not subject.isdecimal() and not is_ss58_address(subject):
+        await ctx.respond("Invalid application id or module key.", ephemeral=True)
+        return
+    await ctx.defer(ephemeral=True)
+    records = await tenant.cache.find_decisions(subject)
+    if not records:
+        await ctx.respond(f"No decisions found for `{subject}`.", ephemeral=True)
+        return
+    lines = [decision_summary(record) for record in records[:10]]
+    await ctx.respond("\n".join(lines), ephemeral=True)
+
+
+@BOT.slash_command(
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
+    description="Shows where a pending application stands.",
+    name="status"
+)
+@commands.cooldown(1, 10, commands.BucketType.user)
+@track_command("status")
+async def status(
+    ctx: discord.ApplicationContext,
+    subject: Option(str, description="Application ID or module key"),
+    ) -> None:
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    subject = subject.strip()
+    if not subject.isdecimal() and not is_ss58_address(subject):
+        await ctx.respond("Invalid application id or module key.", ephemeral=True)
+        return
+    threshold = get_votes_threshold(ctx, tenant.config.ROLE_ID)
+    summary = application_status(tenant.cache, subject, threshold)
+    if summary is None:
+        summary = f"`{subject}` is not pending. Use `/history` to see past decisions."
+    await ctx.respond(summary, ephemeral=True)
+
+
+@BOT.slash_command(
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
+    description="Searches past and pending applications.",
+    name="search"
+)
+@commands.cooldown(1, 5, commands.BucketType.user)
+@track_command("search")
+async def search(
+    ctx: discord.ApplicationContext,
+    query: Option(str, description="Words from the title or proposal, a module key or a Discord id"),
+    ) -> None:
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    lines = search_applications(tenant.cache, query)
+    if not lines:
+        await ctx.respond(f"No applications match `{query}`.", ephemeral=True)
+        return
+    await ctx.respond(
+        "\n".join(lines),
+        ephemeral=True,
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
+
+
+@BOT.slash_command(
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
     description="Approves module to a whitelist.",
     manage_roles=True,
     name="approve",
 )
-@commands.has_role(ROLE_ID)
+@has_tenant_role()
 @commands.cooldown(1, 60, commands.BucketType.user)
 @in_nominator_channel()
+@track_command("approve")
 async def approve(
     ctx: discord.ApplicationContext, 
     application_id: Option(int, description="The ID of the application"),
@@ -176,143 +431,231 @@ async def approve(
             ephemeral=True
             )
         return
-    curr_app = CACHE.app_being_voted
-    if not curr_app or curr_app[0].app_id != application_id:
-        await ctx.respond("Invalid application id.", ephemeral=True)
-        return
-    application_key = curr_app[0].app_key
-
-    user_id = str(ctx.author.id)
-    threshold = get_votes_threshold(ctx)
-    #threshold = 1
-
-    valid = await valid_for_approval(application_key, CACHE, ctx)
-    if not valid:
-        return
-    
-    guild = ctx.guild
-    assert guild
-    role = guild.get_role(ROLE_ID)
-    role = check_type(role, discord.Role)
-    discord_user = guild.get_member(int(CACHE.applicator_discord_id))
-    agreement_count = add_approval_vote(CACHE, user_id, application_key, recommended_weight)
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    cache = tenant.cache
+    # votes on other applications are not blocked by this one
+    async with cache.locks.application(application_id):
+        curr_app = cache.app_being_voted
+        if not curr_app or curr_app[0].app_id != application_id:
+            await ctx.respond("Invalid application id.", ephemeral=True)
+            return
+        application_key = curr_app[0].app_key
+
+        user_id = str(ctx.author.id)
+        threshold = get_votes_threshold(ctx, tenant.config.ROLE_ID)
+        #threshold = 1
+
+        valid = await valid_for_approval(application_key, cache, ctx)
+        if not valid:
+            return
+        
+        guild = ctx.guild
+        assert guild
+        role = guild.get_role(tenant.config.ROLE_ID)
+        role = check_type(role, discord.Role)
+        discord_user = guild.get_member(int(cache.applicator_discord_id))
+        agreement_count = add_approval_vote(cache, user_id, application_key, recommended_weight)
 
-    onchain_message = (
-        "Multisig is now adding this module onchain, it will soon start getting votes."
-        if agreement_count == threshold
-        else "Still waiting for more votes, before executing onchain."
-    )
+        onchain_message = (
+            "Multisig is now adding this module onchain, it will soon start getting votes."
+            if agreement_count == threshold
+            else "Still waiting for more votes, before executing onchain."
+        )
 
-    await ctx.respond(
-        f"Nominator {ctx.author.mention} accepted module `{application_key}`.\n"
-        f"This is the `{agreement_count}` agreement out of `{threshold}` threshold.\n"
-        f"{onchain_message}"
-    )
-    if agreement_count >= threshold:
-        await push_to_white_list(CACHE, application_key)
-        CACHE.app_being_voted = None
-        CACHE.app_being_voted_age = 0
-        if discord_user is not None:
-            overwrites = ctx.channel.overwrites # type: ignore just one more ignore bro
-            overwrites[discord_user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
-            await ctx.channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
-    CACHE.save_to_disk()
+        await ctx.respond(
+            f"Nominator {ctx.author.mention} accepted module `{application_key}`.\n"
+            f"This is the `{agreement_count}` agreement out of `{threshold}` threshold.\n"
+            f"{onchain_message}"
+        )
+        if agreement_count >= threshold:
+            async with cache.locks.module(application_key):
+                await push_to_white_list(tenant, curr_app[0])
+            async with cache.locks.global_section():
+                cache.app_being_voted = None
+                cache.app_being_voted_age = 0
+            schedule_publish(tenant)
+            if discord_user is not None:
+                overwrites = ctx.channel.overwrites # type: ignore just one more ignore bro
+                overwrites[discord_user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
+                await ctx.channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
+    await cache.persist()
 
 @BOT.slash_command(
-    guild_ids=[GUILD_ID],  # ! make sure to pass as string
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
     description="Rejects module nomination.",
     manage_roles=True,
     name="reject"
 )
-@commands.has_role(ROLE_ID)
+@has_tenant_role()
 @commands.cooldown(1, 60, commands.BucketType.user)
 @in_nominator_channel()
+@track_command("reject")
 async def reject(
     ctx: discord.ApplicationContext, 
     module_id: Option(int, description="The id of the application"), 
     reason: Option(str, description="The reason of the reffusal"),
     ) -> None:
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    cache = tenant.cache
     # Validate and sanitize the module_key input
-    valid = await valid_for_rejection(ctx, CACHE, module_id, reason)
+    valid = await valid_for_rejection(ctx, cache, module_id, reason)
     if not valid:
         return
 
-    # Acquire the lock before modifying rejection_approvals
     user_id = str(ctx.author.id)
-    rejection_count = add_rejection_vote(CACHE, user_id, module_id)
-    await ctx.respond(
-        f"{ctx.author.mention} is rejecting the module `{module_id}` for the reason: `{reason}`."
-    )
-    guild = ctx.guild
-    assert guild
-    role = guild.get_role(ROLE_ID)
-    role = check_type(role, discord.Role)
-    discord_user = guild.get_member(int(CACHE.applicator_discord_id))
-    threshold = get_votes_threshold(ctx)
-    if rejection_count >= threshold:
-        refuse_dao_application(module_id)
-        CACHE.app_being_voted = None
-        CACHE.app_being_voted_age = 0
-        if discord_user is not None:
-            overwrites = ctx.channel.overwrites # type: ignore just one more ignore bro
-            overwrites[discord_user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
-            await ctx.channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
+    async with cache.locks.application(module_id):
+        curr_app = cache.app_being_voted
+        if not curr_app or curr_app[0].app_id != module_id:
+            await ctx.respond("Invalid application id.", ephemeral=True)
+            return
+        rejection_count = add_rejection_vote(cache, user_id, module_id)
+        await ctx.respond(
+            f"{ctx.author.mention} is rejecting the module `{module_id}` for the reason: `{reason}`."
+        )
+        guild = ctx.guild
+        assert guild
+        role = guild.get_role(tenant.config.ROLE_ID)
+        role = check_type(role, discord.Role)
+        discord_user = guild.get_member(int(cache.applicator_discord_id))
+        threshold = get_votes_threshold(ctx, tenant.config.ROLE_ID)
+        if rejection_count >= threshold:
+            await asyncio.to_thread(
+                refuse_dao_application,
+                module_id, tenant.config.MNEMONIC, tenant.config.USE_TESTNET,
+            )
+            async with cache.locks.global_section():
+                cache.record_application_decision(curr_app[0], "refused")
+                cache.drop_nomination_votes(curr_app[0].app_key)
+                cache.app_being_voted = None
+                cache.app_being_voted_age = 0
+            schedule_publish(tenant)
+            if discord_user is not None:
+                overwrites = ctx.channel.overwrites # type: ignore just one more ignore bro
+                overwrites[discord_user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
+                await ctx.channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
 
 
-    CACHE.save_to_disk()
+    await cache.persist()
 
 @BOT.slash_command(
-    guild_ids=[GUILD_ID],  # ! make sure to pass as string
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
     description="Removes module from a whitelist.",
     manage_roles=True,
     name="remove"
 )
-@commands.has_role(ROLE_ID)
+@has_tenant_role()
 @commands.cooldown(1, 60, commands.BucketType.user)
 @in_nominator_channel()
+@track_command("remove")
 async def remove(ctx: discord.ApplicationContext, module_key: str, reason: str) -> None:
 
     # Validate and sanitize the module_key input
     module_key = html.escape(module_key.strip())
     reason = html.escape(reason.strip())
     user_id = str(ctx.author.id)
+    tenant = tenant_for(ctx.guild)
+    assert tenant
+    cache = tenant.cache
     
-    threshold = get_votes_threshold(ctx)
+    threshold = get_votes_threshold(ctx, tenant.config.ROLE_ID)
     #threshold = 1
 
-    valid = await valid_for_removal(ctx, CACHE, module_key, user_id, reason)
-    if not valid:
-        return
-    
-    module_key = check_type(module_key, Ss58Address)
-    agreement_count = add_removal_vote(CACHE, user_id, module_key)
+    async with cache.locks.module(module_key):
+        valid = await valid_for_removal(ctx, cache, module_key, user_id, reason)
+        if not valid:
+            return
+        
+        module_key = check_type(module_key, Ss58Address)
+        agreement_count = add_removal_vote(cache, user_id, module_key)
+
+        onchain_message = (
+            "Multisig is now removing this module onchain, it will soon be removed."
+            if agreement_count >= threshold
+            else "Still waiting for more votes, before executing onchain."
+        )
 
-    onchain_message = (
-        "Multisig is now removing this module onchain, it will soon be removed."
-        if agreement_count >= threshold
-        else "Still waiting for more votes, before executing onchain."
-    )
+        await ctx.respond(
+            f"Nominator {ctx.author.mention} asked to remove module `{module_key}`.\n"
+            f"For the reason: `{reason}`.\n"
+            f"This is the `{agreement_count}` agreement out of `{threshold}` threshold.\n"
+            f"{onchain_message}"
+        )
 
-    await ctx.respond(
-        f"Nominator {ctx.author.mention} asked to remove module `{module_key}`.\n"
-        f"For the reason: `{reason}`.\n"
-        f"This is the `{agreement_count}` agreement out of `{threshold}` threshold.\n"
-        f"{onchain_message}"
-    )
+        if agreement_count >= threshold:
+            await pop_from_whitelist(tenant, module_key)
 
-    if agreement_count >= threshold:
-        await pop_from_whitelist(CACHE, module_key)
+    await cache.persist()
 
-    CACHE.save_to_disk()
 
 
+@BOT.slash_command(
+    guild_ids=GUILD_IDS,  # ! make sure to pass as string
+    description="Profiles the bot for a while and returns the hot spots.",
+    name="profile"
+)
+@commands.has_permissions(administrator=True)
+@track_command("profile")
+async def profile_command(
+    ctx: discord.ApplicationContext,
+    seconds: Option(int, description=f"Between 1 and {MAX_PROFILE_SECONDS}", default=30),
+    ) -> None:
+    if seconds <= 0 or seconds > MAX_PROFILE_SECONDS:
+        await ctx.respond(
+            f"Invalid duration. It should be a value between 1 and {MAX_PROFILE_SECONDS}.",
+            ephemeral=True
+            )
+        return
+    await ctx.defer(ephemeral=True)
+    try:
+        report = await profile(seconds)
+    except ProfilerBusy as e:
+        await ctx.respond(str(e), ephemeral=True)
+        return
+    await ctx.respond(
+        f"```\n{report.summary()[:1900]}\n```",
+        file=discord.File(report.dump_path),
+        ephemeral=True,
+    )
+
 
 def main() -> None:
+    global PROFILE_ON_READY
+    parser = argparse.ArgumentParser(description="Module curation DAO bot")
+    parser.add_argument(
+        "--profile",
+        type=int,
+        default=0,
+        metavar="SECONDS",
+        help="profile the bot for SECONDS once it is online",
+    )
+    args = parser.parse_args()
+    PROFILE_ON_READY = min(args.profile, MAX_PROFILE_SECONDS)
+    recorder = None
+    if REPLAY.RECORD_FILE:
+        from .sim.replay import TrafficRecorder
+        recorder = TrafficRecorder()
+        recorder.install()
+
     # get the whitelist, so we don't have to query many times
-    white = whitelist()
-    CACHE.current_whitelist = white
-    print(f"WHITELIST: {CACHE.current_whitelist}")
+    for tenant in TENANTS.values():
+        tenant.cache.current_whitelist = whitelist(tenant.config.USE_TESTNET)
+        LOGGER.info(
+            f"Loaded the whitelist of {tenant.name}",
+            extra={"tenant": tenant.name, "modules": len(tenant.cache.current_whitelist)},
+        )
+    if MONITORING.METRICS_PORT:
+        try:
+            start_metrics_server(MONITORING.METRICS_HOST, MONITORING.METRICS_PORT)
+        except OSError as e:
+            LOGGER.warning(
+                f"Metrics disabled, can't bind port {MONITORING.METRICS_PORT}: {e}"
+            )
     BOT.run(BOT_TOKEN)
+    LEASE.release()
+    if recorder is not None:
+        recorder.save(REPLAY.RECORD_FILE)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,52 @@
 from typing import Any
+from dataclasses import dataclass
+import sys
+
+from communex.key import is_ss58_address
 from communex.types import Ss58Address
-from pydantic import BaseModel
 
-class Application(BaseModel):
+
+@dataclass(slots=True)
+class Application:
+    """
+    Validated on construction; `from_trusted` skips validation for records
+    read back from our own state file.
+    """
     discord_id: str
     app_id: int
     title: str
     body: str
-    app_key: Ss58Address
\ No newline at end of file
+    app_key: Ss58Address
+
+    def __post_init__(self) -> None:
+        for name in ("discord_id", "title", "body"):
+            if not isinstance(getattr(self, name), str):
+                raise ValueError(f"Application.{name} must be a string")
+        if isinstance(self.app_id, bool) or not isinstance(self.app_id, int):
+            raise ValueError("Application.app_id must be an integer")
+        if not isinstance(self.app_key, str) or not is_ss58_address(self.app_key):
+            raise ValueError("Application.app_key must be a SS58 address")
+        self.app_key = Ss58Address(sys.intern(self.app_key))
+
+    @classmethod
+    def model_validate(cls, data: dict[str, Any]) -> "Application":
+        return cls(**data)
+
+    @classmethod
+    def from_trusted(cls, data: dict[str, Any]) -> "Application":
+        app = object.__new__(cls)
+        app.discord_id = data["discord_id"]
+        app.app_id = data["app_id"]
+        app.title = data["title"]
+        app.body = data["body"]
+        app.app_key = Ss58Address(sys.intern(data["app_key"]))
+        return app
+
+    def model_dump(self) -> dict[str, Any]:
+        return {
+            "discord_id": self.discord_id,
+            "app_id": self.app_id,
+            "title": self.title,
+            "body": self.body,
+            "app_key": self.app_key,
+        }
@@ -1,4 +1,143 @@
+"""
+Logging that never waits on stdout.
+
+Records are handed to a bounded queue by the thread that logs them and
+written by a listener thread, one JSON object per line. Each record
+carries the correlation id of the command or tick it was logged from,
+see `correlated`. A full queue drops records instead of blocking.
+"""
+from typing import Any, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from itertools import count
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from .settings import LOGGING
+
+CORRELATION_ID: ContextVar[str] = ContextVar("correlation_id", default="")
+_SEQUENCE = count(1)
+
+# attributes every LogRecord has, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def new_correlation_id(kind: str) -> str:
+    return f"{kind}-{next(_SEQUENCE):x}"
+
+
+@contextmanager
+def correlated(kind: str) -> Iterator[str]:
+    """Tags the records logged inside, tasks and threads started inside included."""
+    correlation_id = new_correlation_id(kind)
+    token = CORRELATION_ID.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        CORRELATION_ID.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                data[name] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs in the logging thread: stamps the correlation id, which the
+    writer thread couldn't see, and samples low level records.
+    """
+    def __init__(self, sample_rates: dict[int, float]) -> None:
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = CORRELATION_ID.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, records: "queue.Queue[Any]") -> None:
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Only merges the arguments into the message; tracebacks are formatted
+        by the listener thread, not by the thread that logs.
+        """
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Looks `sys.stdout` up on every record, so redirections apply."""
+    @property
+    def stream(self):  # type: ignore
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value: Any) -> None:
+        pass
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    output = StdoutHandler()
+    if LOGGING.FORMAT == "text":
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s"
+        ))
+    else:
+        output.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(LOGGING.QUEUE_SIZE))
+    handler.addFilter(ContextFilter({
+        logging.DEBUG: LOGGING.DEBUG_SAMPLE_RATE,
+        logging.INFO: LOGGING.INFO_SAMPLE_RATE,
+    }))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOGGING.LIBRARY_LEVEL.upper())
+    LOGGER.setLevel(LOGGING.LEVEL.upper())
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    # flushes what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
 
-logging.basicConfig(level=logging.ERROR)
-LOGGER = logging.getLogger("discord_bot")
\ No newline at end of file
+LOGGER = logging.getLogger("discord_bot")
+LISTENER = setup_logging()
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+import socket
 from dataclasses import dataclass
 from pydantic_settings import BaseSettings
 import discord
@@ -9,10 +10,11 @@ from communex._common import get_node_url
 
 class DiscordParams(BaseSettings):
     BOT_TOKEN: str
-    GUILD_ID: int
-    REQUEST_CHANNEL_ID: int
-    NOMINATOR_CHANNEL_ID: int
-    ROLE_ID: int
+    # used for the single DAO setup, see `DaoTenants` for hosting several
+    GUILD_ID: int = 0
+    REQUEST_CHANNEL_ID: int = 0
+    NOMINATOR_CHANNEL_ID: int = 0
+    ROLE_ID: int = 0
 
     class Config:
         env_prefix = "DISCORD_"
@@ -21,23 +23,198 @@ class DiscordParams(BaseSettings):
 
 
 class Subspace(BaseSettings):
-    MNEMONIC: str
+    # default multisig key for tenants that don't set their own
+    MNEMONIC: str = ""
 
     class Config:
         env_prefix = "SUBSPACE_"
         env_file = "env/dev.env"
         extra="ignore"
 
+
+class DaoTenants(BaseSettings):
+    # JSON file with a list of tenants, see `config/tenants.py`
+    FILE: str = ""
+    # websocket connections per chain client, shared by tenants of a network
+    CHAIN_CONNECTIONS: int = 2
+
+    class Config:
+        env_prefix = "DAO_TENANTS_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class StorageReads(BaseSettings):
+    # seconds a storage map read is reused without asking for the head block,
+    # about one block time
+    TTL: float = 6
+    # items kept over every cached view of a storage map, older blocks go first
+    MAX_ITEMS: int = 100_000
+    # storage map entries fetched per request while streaming a map
+    PAGE_SIZE: int = 100
+
+    class Config:
+        env_prefix = "STORAGE_READS_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class HighAvailability(BaseSettings):
+    # SQLite file holding the leader lease, shared by every replica; empty
+    # runs a single replica that always leads
+    LEASE_FILE: str = ""
+    LEASE_SECONDS: float = 10
+    REPLICA_ID: str = f"{socket.gethostname()}-{os.getpid()}"
+
+    class Config:
+        env_prefix = "HA_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Logging(BaseSettings):
+    # level of the bot's own records
+    LEVEL: str = "INFO"
+    # level of discord, websockets and the other libraries
+    LIBRARY_LEVEL: str = "ERROR"
+    # "json", or "text" to read them in a terminal
+    FORMAT: str = "json"
+    # share of DEBUG and INFO records kept, warnings and errors are all kept
+    DEBUG_SAMPLE_RATE: float = 1.0
+    INFO_SAMPLE_RATE: float = 1.0
+    # records waiting for the writer thread, further ones are dropped
+    QUEUE_SIZE: int = 10_000
+
+    class Config:
+        env_prefix = "LOG_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Replay(BaseSettings):
+    # records chain and IPFS traffic to this fixture file, see `sim/replay.py`
+    RECORD_FILE: str = ""
+
+    class Config:
+        env_prefix = "REPLAY_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Api(BaseSettings):
+    HOST: str = "127.0.0.1"
+    # 0 disables the read-only state API
+    PORT: int = 0
+
+    class Config:
+        env_prefix = "API_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Retention(BaseSettings):
+    # decisions stay in the state file this long before they are archived
+    SECONDS: float = 7 * 24 * 60 * 60
+    SEGMENT_BYTES: int = 4 * 1024 * 1024
+
+    class Config:
+        env_prefix = "RETENTION_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class RateLimits(BaseSettings):
+    # module requests a user can send back to back, then one per period
+    MODULE_REQUEST_BURST: int = 1
+    MODULE_REQUEST_SECONDS: float = 60 * 60
+
+    class Config:
+        env_prefix = "RATE_LIMITS_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Digest(BaseSettings):
+    # posts an overview of newly queued applications every tick
+    ENABLED: bool = True
+    # Discord rejects messages over 2000 characters
+    PAGE_CHARS: int = 2000
+    # pages per tick, the remaining applications are only counted
+    MAX_PAGES: int = 5
+
+    class Config:
+        env_prefix = "DIGEST_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Publishing(BaseSettings):
+    # queued applications kept rendered ahead of the voting slot
+    LOOKAHEAD: int = 3
+
+    class Config:
+        env_prefix = "PUBLISH_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+
+class Monitoring(BaseSettings):
+    METRICS_HOST: str = "127.0.0.1"
+    # 0 disables the metrics endpoint
+    METRICS_PORT: int = 9464
+
+    class Config:
+        env_prefix = "MONITORING_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
+class Ipfs(BaseSettings):
+    # multiaddr of a local IPFS daemon API, empty to skip it
+    API_ADDR: str = "/dns/localhost/tcp/5001/http"
+    GATEWAYS: list[str] = [
+        "https://ipfs.io/ipfs/",
+        "https://dweb.link/ipfs/",
+        "https://gateway.pinata.cloud/ipfs/",
+    ]
+    # how many of the best ranked gateways are raced at once
+    RACE_WIDTH: int = 3
+    TIMEOUT: float = 20
+    # the daemon is raced with the gateways, but is given up on sooner
+    LOCAL_TIMEOUT: float = 5
+    # proposals over this size are dropped without reading the rest
+    MAX_DOCUMENT_BYTES: int = 256 * 1024
+    # proposals resolved at once when several applications are new
+    FETCH_CONCURRENCY: int = 8
+    # applications ingested and saved per step of a backfill
+    BACKFILL_CHUNK: int = 32
+    # resolved proposals kept in memory, shared by every tenant
+    CACHE_BYTES: int = 8 * 1024 * 1024
+
+    class Config:
+        env_prefix = "IPFS_"
+        env_file = "env/dev.env"
+        extra="ignore"
+
 MINUTES = 60 * 60
 HOURS = MINUTES * 60
 DAYS = HOURS * 24
 ROLE_NAME = "dao-member"
 #NODE_URL = "wss://testnet-commune-api-node-0.communeai.net"  # "wss://commune.api.onfinality.io/public-ws"
 USE_TESTNET = False
-MODULE_SUBMISSION_DELAY = 3600
 INTENTS = discord.Intents.all()
 BOT = commands.Bot(command_prefix="/", intents=INTENTS)
 MNEMONIC = Subspace().MNEMONIC # type: ignore
 DISCORD_PARAMS = DiscordParams() # type: ignore
-ROLE_ID = DISCORD_PARAMS.ROLE_ID
+DAO_TENANTS = DaoTenants()
+HIGH_AVAILABILITY = HighAvailability()
+STORAGE_READS = StorageReads()
+RETENTION = Retention()
+RATE_LIMITS = RateLimits()
+DIGEST = Digest()
+PUBLISHING = Publishing()
+MONITORING = Monitoring()
+API = Api()
+LOGGING = Logging()
+REPLAY = Replay()
+IPFS = Ipfs()
 MAXIMUM_VOTING_AGE = DAYS * 1
@@ -0,0 +1,64 @@
+"""
+DAO tenants hosted by this bot process.
+
+Without `DAO_TENANTS_FILE` there is a single tenant built from the
+`DISCORD_*`/`SUBSPACE_*` settings, stored in `./state.json`. The file holds a
+JSON list like:
+
+    [
+        {"NAME": "mainnet", "GUILD_ID": 1, "REQUEST_CHANNEL_ID": 2,
+         "NOMINATOR_CHANNEL_ID": 3, "ROLE_ID": 4},
+        {"NAME": "testnet", "GUILD_ID": 5, "REQUEST_CHANNEL_ID": 6,
+         "NOMINATOR_CHANNEL_ID": 7, "ROLE_ID": 8, "USE_TESTNET": true,
+         "MNEMONIC": "..."}
+    ]
+"""
+import json
+
+from pydantic import BaseModel
+
+from .settings import DAO_TENANTS, DISCORD_PARAMS, MNEMONIC, USE_TESTNET
+
+
+class TenantConfig(BaseModel):
+    NAME: str
+    GUILD_ID: int
+    REQUEST_CHANNEL_ID: int
+    NOMINATOR_CHANNEL_ID: int
+    ROLE_ID: int
+    USE_TESTNET: bool = USE_TESTNET
+    MNEMONIC: str = MNEMONIC
+    STATE_FILE: str = ""
+
+
+def load_tenant_configs() -> list[TenantConfig]:
+    if DAO_TENANTS.FILE:
+        with open(DAO_TENANTS.FILE, 'r') as file:
+            configs = [TenantConfig.model_validate(entry) for entry in json.load(file)]
+        for config in configs:
+            config.STATE_FILE = config.STATE_FILE or f"./state-{config.NAME}.json"
+    else:
+        configs = [
+            TenantConfig(
+                NAME="default",
+                GUILD_ID=DISCORD_PARAMS.GUILD_ID,
+                REQUEST_CHANNEL_ID=DISCORD_PARAMS.REQUEST_CHANNEL_ID,
+                NOMINATOR_CHANNEL_ID=DISCORD_PARAMS.NOMINATOR_CHANNEL_ID,
+                ROLE_ID=DISCORD_PARAMS.ROLE_ID,
+                STATE_FILE="./state.json",
+            )
+        ]
+
+    for config in configs:
+        if not all((
+            config.GUILD_ID, config.REQUEST_CHANNEL_ID,
+            config.NOMINATOR_CHANNEL_ID, config.ROLE_ID,
+        )):
+            raise ValueError(f"Tenant {config.NAME} is missing Discord ids")
+        if not config.MNEMONIC:
+            raise ValueError(f"Tenant {config.NAME} has no multisig mnemonic")
+    for field in ("NAME", "GUILD_ID", "STATE_FILE"):
+        values = [getattr(config, field) for config in configs]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Tenants must have distinct {field} values")
+    return configs
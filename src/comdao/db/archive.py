@@ -0,0 +1,107 @@
+"""
+Cold storage for decided applications and removals.
+
+Records are JSON lines in gzip segments (`segment-000001.jsonl.gz`, ...).
+Every `append` adds one gzip member to the current segment, so files are
+only ever appended to and stay readable as a single gzip stream. A new
+segment starts once the current one is over `segment_bytes`, and on the
+first append of each process, so a member cut short by a crash is always
+the last one of its segment.
+"""
+from typing import Any, Iterator
+from threading import Lock
+import gzip
+import json
+import os
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+def record_id(record: dict[str, Any]) -> tuple[str, str, float]:
+    return record["kind"], str(record["subject"]), record["decided_at"]
+
+
+def matches(record: dict[str, Any], subject: Any) -> bool:
+    subject = str(subject)
+    return str(record["subject"]) == subject or record.get("app_key") == subject
+
+
+class Archive:
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = Lock()
+        self._current: str | None = None
+
+    def segments(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            os.path.join(self.directory, name) for name in names
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def append(self, records: list[dict[str, Any]]) -> None:
+        """Blocking; returns once the records are on disk."""
+        if not records:
+            return
+        payload = "".join(json.dumps(record) + "\n" for record in records)
+        member = gzip.compress(payload.encode())
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self._current is None or os.path.getsize(self._current) >= self.segment_bytes:
+                self._current = self._next_segment()
+            with open(self._current, "ab") as file:
+                file.write(member)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _next_segment(self) -> str:
+        segments = self.segments()
+        number = 1
+        if segments:
+            name = os.path.basename(segments[-1])
+            number = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+        return os.path.join(
+            self.directory, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+        )
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        """Newest segment first; records inside a segment in append order."""
+        for path in reversed(self.segments()):
+            try:
+                with gzip.open(path, "rt") as file:
+                    lines = list(file)
+            except (EOFError, OSError):
+                # a member cut short by a crash, keep what can be read
+                lines = _readable_lines(path)
+            for line in lines:
+                yield json.loads(line)
+
+    def lookup(self, subject: Any) -> list[dict[str, Any]]:
+        """
+        Blocking; every archived record about `subject` (an application id
+        or a module key), newest first.
+        """
+        found: dict[tuple[str, str, float], dict[str, Any]] = {}
+        for record in self.records():
+            if matches(record, subject):
+                # the same record is archived twice if a crash came between
+                # the archive write and the state file write
+                found.setdefault(record_id(record), record)
+        return sorted(found.values(), key=lambda record: -record["decided_at"])
+
+
+def _readable_lines(path: str) -> list[str]:
+    lines: list[str] = []
+    with gzip.open(path, "rt") as file:
+        try:
+            for line in file:
+                if line.endswith("\n"):
+                    lines.append(line)
+        except (EOFError, OSError):
+            pass
+    return lines
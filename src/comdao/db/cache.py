@@ -1,26 +1,36 @@
 from typing import Callable, TypeVar, ParamSpec, Coroutine, Any
 from threading import Lock
+from time import time
+import asyncio
+import hashlib
 import json
+import os
+import sys
 
 from communex.types import Ss58Address
 
 from comdao.config.application import Application
+from comdao.config.loggers import LOGGER
+from comdao.config.settings import RATE_LIMITS, RETENTION
+from comdao.db.archive import Archive, matches, record_id
+from comdao.db.leader import LEASE
+from comdao.db.locks import CacheLocks
+from comdao.db.ratelimit import RateLimiter
+from comdao.db.search import SearchIndex, write_index
+from comdao.helpers.metrics import PERSISTENCE_SECONDS
 
 
-class NominationVote(dict):
+class NominationVote:
+    __slots__ = ("module_key", "recommended_weight")
+
     def __init__(
             self, 
             module_key: Ss58Address, 
             recommended_weight: int
 ) -> None:
-        self.module_key = module_key
+        self.module_key = Ss58Address(sys.intern(module_key))
         self.recommended_weight = recommended_weight
-        dict.__init__(self, module_key=module_key, recommended_weight=recommended_weight)
 
-    def default(self, o):
-        print(o.__dict__)
-        return o.__dict__
-    
     @classmethod
     def from_dict(cls, data):
         return cls(
@@ -28,6 +38,12 @@ class NominationVote(dict):
             recommended_weight=data['recommended_weight']
         )
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "module_key": self.module_key,
+            "recommended_weight": self.recommended_weight,
+        }
+
     def __eq__(self, other):
         if isinstance(other, NominationVote):
             return self.module_key == other.module_key
@@ -35,36 +51,359 @@ class NominationVote(dict):
             return self.module_key == other
         else:
             return False
-        
+
+    def __repr__(self) -> str:
+        return f"NominationVote({self.module_key!r}, {self.recommended_weight!r})"
+
+
+class WeightHistogram:
+    """Recommended weights (1 to 100) given to one module, and who gave them."""
+    __slots__ = ("buckets", "count", "voters")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * 100
+        self.count = 0
+        self.voters: set[str] = set()
+
+    def add(self, user_id: str, weight: int) -> None:
+        self.buckets[min(max(weight, 1), 100) - 1] += 1
+        self.count += 1
+        self.voters.add(user_id)
+
+    def _nth(self, n: int) -> int:
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen > n:
+                return index + 1
+        raise IndexError(n)
+
+    def median(self) -> float | None:
+        # same result as statistics.median over the individual weights
+        if not self.count:
+            return None
+        low, high = (self.count - 1) // 2, self.count // 2
+        if low == high:
+            return self._nth(low)
+        return (self._nth(low) + self._nth(high)) / 2
+
+
+def _without(votes: dict[str, list[Any]], subjects: set[Any]) -> dict[str, list[Any]]:
+    # drops the votes on `subjects`, and the voters left without any vote
+    if not subjects:
+        return votes
+    kept = {
+        user_id: [subject for subject in voted if subject not in subjects]
+        for user_id, voted in votes.items()
+    }
+    return {user_id: voted for user_id, voted in kept.items() if voted}
+
+
+def _intern_keys(keys: list[str]) -> list[Ss58Address]:
+    return [Ss58Address(sys.intern(key)) for key in keys]
+
+
+# 2: application bodies are stored display-ready, not JSON encoded
+STATE_FORMAT = 2
+
+
+def _migrate_body(app_dict: dict[str, Any]) -> dict[str, Any]:
+    # only for states saved before `STATE_FORMAT` 2
+    body = app_dict.get("body")
+    if isinstance(body, str) and len(body) >= 2 and body[0] == body[-1] == '"':
+        try:
+            app_dict["body"] = json.loads(body)
+        except ValueError:
+            pass
+    return app_dict
+
+
 # TODO: make a singleton
 class Cache:
     request_ids: list[Ss58Address] = []
     # discord_user_id : voted_ticket_id
     nomination_approvals: dict[str, list[NominationVote]] = {}
+    # module_key : weights of its pending approval votes, derived from the above
+    weight_histograms: dict[Ss58Address, WeightHistogram] = {}
     removal_approvals: dict[str, list[Ss58Address]] = {}
     rejection_approvals: dict[str, list[int]] = {}
-    last_submission_times = {}
     current_whitelist: list[Ss58Address] = []
     dao_applications: list[str] = []
     render_applications_queue: list[tuple[Application, str]] = []
     app_being_voted: tuple[Application, str] | None = None
     app_being_voted_age: float = 0
     applicator_discord_id: str = ""
+    # outcomes of applications and removals, with their votes, until `compact`
+    # moves them to the archive
+    decided: list[dict[str, Any]] = []
+    # set when the state starts from scratch, until the applications that
+    # were already pending are ingested; `backfill_until` is the highest
+    # application id the backfill covers, once it is known
+    backfilling: bool = False
+    backfill_until: int | None = None
+    # ids of queued applications not yet listed in a digest post
+    undigested: list[int] = []
 
-    def __init__(self) -> None:
-        self._file_path = "./state.json"
+    def __init__(self, file_path: str = "./state.json") -> None:
+        self._file_path = file_path
+        # instance containers, so caches of different tenants never share
+        # the mutable class level defaults
+        self.request_ids = []
+        self.nomination_approvals = {}
+        self.weight_histograms = {}
+        self.removal_approvals = {}
+        self.rejection_approvals = {}
+        # entry point : per-user limiter, saved with the rest of the state
+        self.rate_limits = {
+            "module_request": RateLimiter(
+                RATE_LIMITS.MODULE_REQUEST_BURST, RATE_LIMITS.MODULE_REQUEST_SECONDS
+            ),
+        }
+        self.current_whitelist = []
+        self.dao_applications = []
+        self.render_applications_queue = []
+        self.decided = []
+        self.undigested = []
+        # derived from the queue and the votes, see `_index_queue`
+        self.queue_seq: dict[int, int] = {}
+        self.app_ids_by_key: dict[Ss58Address, int] = {}
+        self.rejection_counts: dict[int, int] = {}
+        self._queue_head = 0
+        self._queue_tail = 0
+        # bumped when a save or a load changes the state, see `_write`
+        self.version = 0
+        self._digest = b""
+        self.archive = Archive(
+            os.path.splitext(file_path)[0] + ".archive", RETENTION.SEGMENT_BYTES
+        )
+        # every ingested application, kept in its own file since it only
+        # changes when applications arrive
+        self.search = SearchIndex()
+        self._search_path = os.path.splitext(file_path)[0] + ".search.json"
+        self._search_snapshotted = 0
+        self._search_written = 0
         self.load_from_disk()
-        self.lock = Lock()
+        self.locks = CacheLocks()
+        self._write_lock = Lock()
+        self._snapshot_seq = 0
+        self._written_seq = 0
 
     def save_to_disk(self):
-            print("SAVING TO DISK")
+        self._write(*self._snapshot())
+
+    def _histogram(self, module_key: Ss58Address) -> WeightHistogram:
+        histogram = self.weight_histograms.get(module_key)
+        if histogram is None:
+            histogram = self.weight_histograms[module_key] = WeightHistogram()
+        return histogram
+
+    def add_nomination_vote(
+            self, user_id: str, module_key: Ss58Address, recommended_weight: int
+    ) -> int:
+        """Records the vote and returns how many approvals the module has."""
+        vote = NominationVote(module_key, recommended_weight)
+        self.nomination_approvals.setdefault(user_id, []).append(vote)
+        histogram = self._histogram(vote.module_key)
+        histogram.add(user_id, recommended_weight)
+        return histogram.count
+
+    def median_weight(self, module_key: Ss58Address) -> float | None:
+        histogram = self.weight_histograms.get(module_key)
+        return histogram.median() if histogram else None
+
+    def add_rejection_vote(self, user_id: str, app_id: int) -> int:
+        """Records the vote and returns how many rejections the application has."""
+        self.rejection_approvals.setdefault(user_id, []).append(app_id)
+        self.rejection_counts[app_id] = self.rejection_counts.get(app_id, 0) + 1
+        return self.rejection_counts[app_id]
+
+    def _index_queue(self):
+        # sequence numbers of the queued applications; the head of the queue
+        # has `_queue_head`, so popping it doesn't renumber the others
+        self.queue_seq = {
+            app.app_id: seq for seq, (app, _) in enumerate(self.render_applications_queue)
+        }
+        self._queue_head = 0
+        self._queue_tail = len(self.render_applications_queue)
+        self.app_ids_by_key = {
+            app.app_key: app.app_id for app, _ in self.render_applications_queue
+        }
+        if self.app_being_voted:
+            app = self.app_being_voted[0]
+            self.app_ids_by_key[app.app_key] = app.app_id
+
+    def insert_applications(self, position: int, applications: list[tuple[Application, str]]):
+        """Callers hold the global section."""
+        if not applications:
+            return
+        queue = self.render_applications_queue
+        if position >= len(queue):
+            for app in applications:
+                queue.append(app)
+                self.queue_seq[app[0].app_id] = self._queue_tail
+                self._queue_tail += 1
+                self.app_ids_by_key[app[0].app_key] = app[0].app_id
+        else:
+            # only the backfill inserts ahead of queued applications, once a
+            # chunk, and the list insert is as costly as renumbering
+            queue[position:position] = applications
+            self._index_queue()
+
+    def pop_next_application(self) -> tuple[Application, str]:
+        """Callers hold the global section and checked the queue isn't empty."""
+        app = self.render_applications_queue.pop(0)
+        del self.queue_seq[app[0].app_id]
+        self._queue_head += 1
+        return app
+
+    def queue_position(self, app_id: int) -> int | None:
+        """1 for the next application to be voted on, None if not queued."""
+        seq = self.queue_seq.get(app_id)
+        return None if seq is None else seq - self._queue_head + 1
+
+    def pending_app_id(self, subject: str) -> int | None:
+        """The queued or voted application with this id or module key."""
+        if subject.isdecimal():
+            app_id = int(subject)
+        else:
+            app_id = self.app_ids_by_key.get(Ss58Address(subject))
+            if app_id is None:
+                return None
+        if app_id in self.queue_seq:
+            return app_id
+        if self.app_being_voted and self.app_being_voted[0].app_id == app_id:
+            return app_id
+        return None
+
+    def drop_nomination_votes(self, module_key: Ss58Address) -> None:
+        """Forgets every approval vote of a decided module."""
+        histogram = self.weight_histograms.pop(module_key, None)
+        if histogram is None:
+            return
+        for user_id in histogram.voters:
+            votes = self.nomination_approvals.get(user_id)
+            if votes:
+                self.nomination_approvals[user_id] = [
+                    vote for vote in votes if vote.module_key != module_key
+                ]
+
+    def record_application_decision(self, application: Application, outcome: str):
+        """Call before the votes are dropped, `outcome` is "accepted" or "refused"."""
+        app_id = application.app_id
+        histogram = self.weight_histograms.get(application.app_key)
+        approvals = {
+            user_id: vote.recommended_weight
+            for user_id in (histogram.voters if histogram else ())
+            for vote in self.nomination_approvals.get(user_id, [])
+            if vote.module_key == application.app_key
+        }
+        self.decided.append({
+            "kind": "application",
+            "subject": app_id,
+            "outcome": outcome,
+            "decided_at": time(),
+            "app_key": application.app_key,
+            "discord_id": application.discord_id,
+            "title": application.title,
+            "approvals": approvals,
+            "rejections": [
+                user_id for user_id, app_ids in self.rejection_approvals.items()
+                if app_id in app_ids
+            ],
+        })
+
+    def record_removal(self, module_key: Ss58Address):
+        self.decided.append({
+            "kind": "removal",
+            "subject": module_key,
+            "outcome": "removed",
+            "decided_at": time(),
+            "votes": [
+                user_id for user_id, keys in self.removal_approvals.items()
+                if module_key in keys
+            ],
+        })
+
+    async def compact(self, retention: float = RETENTION.SECONDS) -> int:
+        """
+        Archives decisions older than `retention` seconds and drops them and
+        their votes from the hot state. The caller persists afterwards.
+        """
+        cutoff = time() - retention
+        expired = [record for record in self.decided if record["decided_at"] < cutoff]
+        if not expired:
+            return 0
+        # archived before they leave the state file, a crash in between
+        # only archives them twice, which `Archive.lookup` tolerates
+        await asyncio.to_thread(self.archive.append, expired)
+        async with self.locks.global_section():
+            self._prune(expired)
+        return len(expired)
+
+    def _prune(self, expired: list[dict[str, Any]]):
+        expired_ids = {id(record) for record in expired}
+        self.decided = [record for record in self.decided if id(record) not in expired_ids]
+        # the same module may have applied again, or been whitelisted again
+        live_keys = {app.app_key for app, _ in self.render_applications_queue}
+        if self.app_being_voted:
+            live_keys.add(self.app_being_voted[0].app_key)
+        whitelisted = set(self.current_whitelist)
+        app_ids = {
+            record["subject"] for record in expired if record["kind"] == "application"
+        }
+        app_keys = {
+            record["app_key"] for record in expired
+            if record["kind"] == "application" and record["app_key"] not in live_keys
+        }
+        removed_keys = {
+            record["subject"] for record in expired
+            if record["kind"] == "removal" and record["subject"] not in whitelisted
+        }
+        self.dao_applications = [
+            app_id for app_id in self.dao_applications if app_id not in app_ids
+        ]
+        self.request_ids = [key for key in self.request_ids if key not in app_keys]
+        self.rejection_approvals = _without(self.rejection_approvals, app_ids)
+        for app_id in app_ids:
+            self.rejection_counts.pop(app_id, None)
+        for key in app_keys:
+            self.app_ids_by_key.pop(key, None)
+        self.removal_approvals = _without(self.removal_approvals, removed_keys)
+
+    async def find_decisions(self, subject: Any) -> list[dict[str, Any]]:
+        """Hot and archived decisions about an application id or module key."""
+        hot = [record for record in reversed(self.decided) if matches(record, subject)]
+        archived = await asyncio.to_thread(self.archive.lookup, subject)
+        seen = {record_id(record) for record in hot}
+        return hot + [record for record in archived if record_id(record) not in seen]
+
+    async def persist(self):
+        """
+        Snapshots the state inside the global section and writes it from a
+        worker thread, so the event loop never waits on disk I/O.
+        """
+        async with self.locks.global_section():
+            snapshot = self._snapshot()
+        await asyncio.to_thread(self._write, *snapshot)
+
+    async def reload(self):
+        """Reads back what another replica persisted, e.g. after a takeover."""
+        async with self.locks.global_section():
+            await asyncio.to_thread(self.load_from_disk)
+
+    def _snapshot(self) -> tuple[int, str, tuple[str, ...], tuple[int, str] | None]:
+        with PERSISTENCE_SECONDS.time(operation="snapshot"):
             if self.app_being_voted:
                 app = (self.app_being_voted[0].model_dump(), self.app_being_voted[1])
             else:
                 app = None
             data = {
+                "format": json.dumps(STATE_FORMAT),
                 'request_ids': json.dumps(self.request_ids),
-                'nomination_approvals': json.dumps(self.nomination_approvals),
+                'nomination_approvals': json.dumps({
+                    user_id: [vote.to_dict() for vote in votes]
+                    for user_id, votes in self.nomination_approvals.items()
+                }),
                 'removal_approvals': json.dumps(self.removal_approvals),
                 'rejection_approvals': json.dumps(self.rejection_approvals),
                 'dao_applications': json.dumps(self.dao_applications),
@@ -76,48 +415,133 @@ class Cache:
                 'app_being_voted': json.dumps(app),
                 "app_being_voted_age": json.dumps(self.app_being_voted_age),
                 "applicator_discord_id": json.dumps(self.applicator_discord_id),
+                "decided": json.dumps(self.decided),
+                "backfilling": json.dumps(self.backfilling),
+                "backfill_until": json.dumps(self.backfill_until),
+                "undigested": json.dumps(self.undigested),
+                "rate_limits": json.dumps({
+                    name: limiter.to_dict() for name, limiter in self.rate_limits.items()
+                }),
             }
-            with open(self._file_path, 'w') as file:
-                json.dump(data, file)
+            search = None
+            if self.search.version != self._search_snapshotted:
+                self._search_snapshotted = self.search.version
+                search = (self.search.version, self.search.dumps())
+            self._snapshot_seq += 1
+            # the whitelist comes from the chain and isn't saved, but readers
+            # of `version` care about it too
+            return (
+                self._snapshot_seq, json.dumps(data), tuple(self.current_whitelist), search
+            )
+
+    def _write(
+            self,
+            seq: int,
+            payload: str,
+            whitelist: tuple[str, ...] = (),
+            search: tuple[int, str] | None = None,
+        ):
+        with self._write_lock, PERSISTENCE_SECONDS.time(operation="save"):
+            # a deposed replica finishing a command must not overwrite what
+            # the new leader reloaded and decided since
+            if not LEASE.holds_lease:
+                LOGGER.warning("Not saving the state, the leader lease is lost", extra={
+                    "path": self._file_path, "seq": seq,
+                })
+                return
+            # versioned apart from the state, a later snapshot only carries
+            # the index if it changed again
+            if search is not None and search[0] > self._search_written:
+                write_index(self._search_path, search[1])
+                self._search_written = search[0]
+            # a newer snapshot may already be on disk
+            if seq <= self._written_seq:
+                return
+            digest = hashlib.blake2b(payload.encode())
+            digest.update("\n".join(whitelist).encode())
+            if digest.digest() != self._digest:
+                self._digest = digest.digest()
+                self.version += 1
+            LOGGER.debug("Saving state", extra={"path": self._file_path, "seq": seq})
+            tmp_path = self._file_path + ".tmp"
+            with open(tmp_path, 'w') as file:
+                file.write(payload)
+            os.replace(tmp_path, self._file_path)
+            self._written_seq = seq
 
     def load_from_disk(self):
+        with PERSISTENCE_SECONDS.time(operation="load"):
+            self._load_from_disk()
+            self._load_search_index()
+        self.version += 1
+
+    def _load_search_index(self):
+        self.search.load(self._search_path)
+        self._search_snapshotted = self._search_written = self.search.version
+        # states saved before the index existed, or after a crash between
+        # the state and the index writes
+        self.search.add_all(app for app, _ in self.render_applications_queue)
+        if self.app_being_voted:
+            self.search.add(self.app_being_voted[0])
+
+    def _load_from_disk(self):
         try:
             with open(self._file_path, 'r') as file:
                 data = json.load(file)
-                self.request_ids = json.loads(data['request_ids'])
+                # our own file: records are rebuilt without validation
+                self.request_ids = _intern_keys(json.loads(data['request_ids']))
 
                 self.dao_applications = json.loads(data['dao_applications'])
-                self.removal_approvals = json.loads(data['removal_approvals'])
+                self.removal_approvals = {
+                    user_id: _intern_keys(keys)
+                    for user_id, keys in json.loads(data['removal_approvals']).items()
+                }
                 self.rejection_approvals = json.loads(data['rejection_approvals'])
                 self.app_being_voted_age = json.loads(data['app_being_voted_age'])
                 self.applicator_discord_id = json.loads(data['applicator_discord_id'])
-                
+                # states without a format predate it, their bodies need decoding
+                migrate = _migrate_body if 'format' not in data else lambda app_dict: app_dict
+
                 app = json.loads(data['app_being_voted'])
                 if app:
                     self.app_being_voted = (
-                        Application.model_validate(app[0]), app[1]
+                        Application.from_trusted(migrate(app[0])), app[1]
                     )
                 else:
                     self.app_being_voted = None
                 self.render_applications_queue = [
-                (Application.model_validate(app_dict), status)
+                (Application.from_trusted(migrate(app_dict)), status)
                 for app_dict, status in json.loads(data['render_applications_queue'])
                 ]
                 self.nomination_approvals = {}
                 votes_dict = json.loads(data['nomination_approvals'])
                 for user_id in votes_dict:
-                    votes = [NominationVote.from_dict(vote) for vote in votes_dict[user_id]]
+                    votes = [
+                        NominationVote(vote['module_key'], vote['recommended_weight'])
+                        for vote in votes_dict[user_id]
+                    ]
                     self.nomination_approvals[user_id] = votes
+                self.decided = json.loads(data.get('decided', '[]'))
+                self.backfilling = json.loads(data.get('backfilling', 'false'))
+                self.backfill_until = json.loads(data.get('backfill_until', 'null'))
+                self.undigested = json.loads(data.get('undigested', '[]'))
+                rate_limits = json.loads(data.get('rate_limits', '{}'))
+                for name, limiter in self.rate_limits.items():
+                    limiter.load(rate_limits.get(name, {}))
+                self.rejection_counts = {}
+                for app_ids in self.rejection_approvals.values():
+                    for app_id in app_ids:
+                        self.rejection_counts[app_id] = self.rejection_counts.get(app_id, 0) + 1
+                self._index_queue()
+                self.weight_histograms = {}
+                for user_id, votes in self.nomination_approvals.items():
+                    for vote in votes:
+                        self._histogram(vote.module_key).add(user_id, vote.recommended_weight)
                     
 
         except FileNotFoundError:
-            print("Could not find state file. Proceeding from scratch")
-
-    def __enter__(self):
-        self.lock.acquire()
-
-    def __exit__(self, *args, **kwargs):
-        self.lock.release()
+            LOGGER.info("Could not find state file. Proceeding from scratch")
+            self.backfilling = True
 
 T = TypeVar('T')
 P = ParamSpec("P")
@@ -128,9 +552,8 @@ def save_state(cache: Cache):
                 result = await func(*args, **kwargs)
                 return result
             finally:
-                cache.save_to_disk()
+                await cache.persist()
         return wrapper
     return decorator
 
 
-CACHE = Cache()
@@ -0,0 +1,158 @@
+"""
+Leader election between replicas sharing the state files.
+
+The lease is a row in a SQLite database every replica can open. The holder
+renews it every third of its duration; another replica can only take it
+once it expired, so at most one replica believes it leads at any time as
+long as a renewal never takes longer than `LEASE_SAFETY` of the lease.
+"""
+from typing import Awaitable, Callable
+from time import monotonic, time
+import asyncio
+import sqlite3
+
+from comdao.config.settings import HIGH_AVAILABILITY
+from comdao.config.loggers import LOGGER
+
+# fraction of the lease after which the holder stops acting as leader,
+# leaving the rest as slack for a late renewal or a slow extrinsic
+LEASE_SAFETY = 0.75
+
+
+class NotLeader(Exception):
+    pass
+
+
+class LeaderLease:
+    def __init__(self, path: str, holder: str, seconds: float = 10, name: str = "comdao") -> None:
+        self.path = path
+        self.holder = holder
+        self.seconds = seconds
+        self.name = name
+        # bumped on every change of holder, useful to tell terms apart in logs
+        self.term = 0
+        self._valid_until = 0.0
+        self._ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def is_leader(self) -> bool:
+        if not self.enabled:
+            return True
+        return self._ready and monotonic() < self._valid_until
+
+    def ensure_leader(self) -> None:
+        """Raises `NotLeader` unless this replica may write to the chain."""
+        if not self.is_leader:
+            raise NotLeader(f"{self.holder} does not hold the leader lease")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.seconds / 3, isolation_level=None)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS lease ("
+            "name TEXT PRIMARY KEY, holder TEXT NOT NULL, "
+            "term INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return connection
+
+    def try_acquire(self) -> bool:
+        """Blocking; takes or renews the lease, returns whether it is held."""
+        started = monotonic()
+        connection = None
+        try:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT holder, term, expires_at FROM lease WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time()
+            if row is not None and row[0] != self.holder and row[2] > now:
+                connection.execute("ROLLBACK")
+                self._valid_until = 0.0
+                return False
+            term = row[1] if row is not None else 0
+            if row is None or row[0] != self.holder:
+                term += 1
+            connection.execute(
+                "INSERT OR REPLACE INTO lease (name, holder, term, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self.name, self.holder, term, now + self.seconds),
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            LOGGER.warning(f"Leader lease unavailable: {e}")
+            self._valid_until = 0.0
+            return False
+        finally:
+            if connection is not None:
+                connection.close()
+        self.term = term
+        self._valid_until = started + self.seconds * LEASE_SAFETY
+        return True
+
+    def release(self) -> None:
+        """Blocking; lets a standby take over without waiting for expiry."""
+        self._ready = False
+        self._valid_until = 0.0
+        if not self.enabled:
+            return
+        connection = self._connect()
+        try:
+            connection.execute(
+                "DELETE FROM lease WHERE name = ? AND holder = ?", (self.name, self.holder)
+            )
+        finally:
+            connection.close()
+
+    @property
+    def holds_lease(self) -> bool:
+        """Whether this replica may write shared files, even while taking over."""
+        return not self.enabled or monotonic() < self._valid_until
+
+    async def run(self, on_elected: Callable[[], Awaitable[None]]) -> None:
+        """
+        Keeps competing for the lease. `on_elected` runs every time this
+        replica becomes leader, before it starts acting as one, while the
+        lease keeps being renewed. Without a lease file there is nothing to
+        compete for.
+        """
+        if not self.enabled:
+            return
+        election: asyncio.Task[None] | None = None
+        while True:
+            try:
+                held = await asyncio.to_thread(self.try_acquire)
+            except Exception:
+                LOGGER.exception(f"{self.holder} failed to renew the leader lease")
+                self._valid_until = 0.0
+                held = False
+            if election is not None and election.done():
+                election = None
+            if held and not self._ready and election is None:
+                LOGGER.info(f"{self.holder} is now the leader", extra={"term": self.term})
+                election = asyncio.create_task(self._take_over(on_elected, self.term))
+            elif not held and self._ready:
+                LOGGER.warning(f"{self.holder} lost the leader lease, standing by")
+                self._ready = False
+            await asyncio.sleep(self.seconds / 3)
+
+    async def _take_over(self, on_elected: Callable[[], Awaitable[None]], term: int) -> None:
+        try:
+            await on_elected()
+        except Exception:
+            # e.g. a node error while taking over; the next period tries again
+            LOGGER.exception(f"{self.holder} failed to take over, standing by")
+            return
+        # the lease may have been lost while `on_elected` ran
+        if self.term == term and self.holds_lease:
+            self._ready = True
+
+
+LEASE = LeaderLease(
+    HIGH_AVAILABILITY.LEASE_FILE,
+    HIGH_AVAILABILITY.REPLICA_ID,
+    HIGH_AVAILABILITY.LEASE_SECONDS,
+)
@@ -0,0 +1,81 @@
+from typing import AsyncIterator, Callable, Hashable
+import asyncio
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+from comdao.helpers.metrics import LOCK_WAIT_SECONDS
+
+# (scope, seconds waited, seconds held)
+LockObserver = Callable[[str, float, float], None]
+
+
+class KeyedLock:
+    """
+    One `asyncio.Lock` per key. Entries are dropped as soon as nobody holds
+    or waits for them, so the table only ever contains contended keys.
+    """
+
+    def __init__(self) -> None:
+        self._locks: dict[Hashable, tuple[asyncio.Lock, list[int]]] = {}
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = (asyncio.Lock(), [0])
+        lock, users = entry
+        users[0] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            users[0] -= 1
+            if not users[0]:
+                del self._locks[key]
+
+
+class CacheLocks:
+    """
+    Locking layer for `Cache`.
+
+    - `application(app_id)` serializes the voting flow of one application,
+      chain call included. Votes on other applications are not affected.
+    - `module(key)` does the same for whitelist changes of one module.
+    - `global_section()` guards multi-field updates of the shared containers
+      and state snapshots. Never await network I/O while holding it.
+    """
+
+    def __init__(self) -> None:
+        self._global = asyncio.Lock()
+        self._applications = KeyedLock()
+        self._modules = KeyedLock()
+        self.observer: LockObserver | None = None
+
+    @asynccontextmanager
+    async def _timed(self, scope: str, lock) -> AsyncIterator[None]:
+        start = perf_counter()
+        async with lock:
+            acquired = perf_counter()
+            try:
+                yield
+            finally:
+                waited = acquired - start
+                LOCK_WAIT_SECONDS.observe(waited, scope=scope)
+                if self.observer is not None:
+                    self.observer(scope, waited, perf_counter() - acquired)
+
+    def global_section(self):
+        return self._timed("global", self._global)
+
+    def application(self, app_id: int):
+        return self._timed("application", self._applications.hold(app_id))
+
+    def module(self, module_key: str):
+        return self._timed("module", self._modules.hold(module_key))
+
+    def application_busy(self, app_id: int) -> bool:
+        return self._applications.locked(app_id)
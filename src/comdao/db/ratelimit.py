@@ -0,0 +1,64 @@
+"""
+Per-user token buckets for user-facing entry points.
+
+A bucket of `burst` tokens refilled at one token every `period` seconds is
+fully described by the time it will be full again, so that single
+timestamp is all that is stored per user. A full bucket is the same as no
+bucket at all, which lets idle users be dropped as soon as their bucket
+refills.
+"""
+from typing import Any
+from time import time
+
+
+class RateLimiter:
+    def __init__(self, burst: int, period: float) -> None:
+        self.burst = max(burst, 1)
+        self.period = period
+        # user_id : time their bucket is full again
+        self._full_at: dict[str, float] = {}
+        # size after the last sweep, the next one runs once it doubled
+        self._swept_size = 0
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def retry_after(self, user_id: str, now: float | None = None) -> float:
+        """Seconds until `user_id` has a token, 0 if they have one now."""
+        now = time() if now is None else now
+        full_at = self._full_at.get(user_id, now)
+        # a token is missing for every period the bucket is away from full
+        return max(full_at - now - (self.burst - 1) * self.period, 0.0)
+
+    def take(self, user_id: str, now: float | None = None) -> None:
+        """Spends one token, call once `retry_after` said there is one."""
+        now = time() if now is None else now
+        self._full_at[user_id] = max(self._full_at.get(user_id, now), now) + self.period
+        if len(self._full_at) >= 2 * max(self._swept_size, 64):
+            self.sweep(now)
+
+    def acquire(self, user_id: str, now: float | None = None) -> float:
+        """Spends a token if there is one, returns `retry_after` otherwise."""
+        now = time() if now is None else now
+        wait = self.retry_after(user_id, now)
+        if not wait:
+            self.take(user_id, now)
+        return wait
+
+    def sweep(self, now: float | None = None) -> None:
+        """Forgets users whose bucket is full again."""
+        now = time() if now is None else now
+        self._full_at = {
+            user_id: full_at for user_id, full_at in self._full_at.items() if full_at > now
+        }
+        self._swept_size = len(self._full_at)
+
+    def to_dict(self) -> dict[str, int]:
+        self.sweep()
+        # whole seconds are precise enough and keep the state file small;
+        # rounding up never hands out a token early
+        return {user_id: int(-(-full_at // 1)) for user_id, full_at in self._full_at.items()}
+
+    def load(self, data: dict[str, Any]) -> None:
+        self._full_at = {user_id: float(full_at) for user_id, full_at in data.items()}
+        self.sweep()
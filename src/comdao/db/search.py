@@ -0,0 +1,132 @@
+"""
+Inverted index over every application the bot ingested.
+
+Titles, bodies, module keys and applicant ids are split into lowercase
+words; each word maps to the ids of the applications containing it. Only
+the postings and a short summary per application are kept, the bodies
+themselves are not. A query matches the applications that contain every
+one of its words, where the last word may be a prefix.
+"""
+from typing import Iterable
+from bisect import bisect_left
+import json
+import os
+import re
+import sys
+
+from comdao.config.application import Application
+
+_WORD = re.compile(r"[0-9a-z]+")
+# shorter words are too common to narrow anything down
+MIN_WORD_CHARS = 2
+
+
+def words(text: str) -> set[str]:
+    return {
+        sys.intern(word) for word in _WORD.findall(text.lower())
+        if len(word) >= MIN_WORD_CHARS
+    }
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        # word : ids of the applications containing it
+        self.postings: dict[str, set[int]] = {}
+        # app_id : (title, app_key, discord_id)
+        self.docs: dict[int, tuple[str, str, str]] = {}
+        # bumped on every change, tells `Cache` when to save the index
+        self.version = 0
+        self._vocabulary: list[str] | None = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, application: Application) -> bool:
+        """Indexes an application once, returns whether it was new."""
+        app_id = application.app_id
+        if app_id in self.docs:
+            return False
+        self.docs[app_id] = (
+            application.title, application.app_key, application.discord_id
+        )
+        text = " ".join((
+            application.title, application.body,
+            application.app_key, application.discord_id,
+        ))
+        for word in words(text):
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = set()
+                self._vocabulary = None
+            posting.add(app_id)
+        self.version += 1
+        return True
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        found: set[int] = set()
+        start = bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            found |= self.postings[word]
+        return found
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, tuple[str, str, str]]]:
+        """Matching applications, newest first."""
+        terms = _WORD.findall(query.lower())
+        if not terms:
+            return []
+        # the last word may still be being typed, so it is kept short as a
+        # prefix; other short words were never indexed and would match nothing
+        *exact, last = terms
+        exact = [term for term in exact if len(term) >= MIN_WORD_CHARS]
+        if len(last) < MIN_WORD_CHARS and exact:
+            # e.g. the "3" of "module-3", a whole word rather than a prefix
+            *exact, last = exact
+        candidates = [self.postings.get(term, set()) for term in exact]
+        candidates.append(self._prefixed(last))
+        candidates.sort(key=len)
+        matched = set(candidates[0])
+        for posting in candidates[1:]:
+            if not matched:
+                break
+            matched &= posting
+        # whole word matches of the last word go before prefix matches
+        whole = self.postings.get(last, set())
+        app_ids = sorted(matched, key=lambda app_id: (app_id in whole, app_id), reverse=True)
+        app_ids = app_ids[:limit]
+        return [(app_id, self.docs[app_id]) for app_id in app_ids]
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "docs": self.docs,
+            "postings": {word: sorted(ids) for word, ids in self.postings.items()},
+        })
+
+    def load(self, path: str) -> None:
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        self.docs = {
+            int(app_id): (title, sys.intern(app_key), discord_id)
+            for app_id, (title, app_key, discord_id) in data["docs"].items()
+        }
+        self.postings = {
+            sys.intern(word): set(ids) for word, ids in data["postings"].items()
+        }
+        self._vocabulary = None
+
+    def add_all(self, applications: Iterable[Application]) -> int:
+        return sum(self.add(application) for application in applications)
+
+
+def write_index(path: str, payload: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(payload)
+    os.replace(tmp_path, path)
+
@@ -0,0 +1,49 @@
+from typing import Any
+from time import time
+import asyncio
+
+from comdao.config.tenants import TenantConfig, load_tenant_configs
+from comdao.db.cache import Cache
+from comdao.helpers.metrics import QUEUE_DEPTH, VOTING_SLOT_AGE
+
+
+class Tenant:
+    """One curation DAO: its config and its own partition of the state."""
+
+    def __init__(self, config: TenantConfig) -> None:
+        self.config = config
+        self.name = config.NAME
+        self.cache = Cache(config.STATE_FILE)
+        self.backfill_task: asyncio.Task[None] | None = None
+        self.publish_task: asyncio.Task[None] | None = None
+        # app_id : markdown of the next queued applications, see `prerender_next`
+        self.prerendered: dict[int, str] = {}
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.name!r}, guild={self.config.GUILD_ID})"
+
+
+# guild_id : tenant
+TENANTS: dict[int, Tenant] = {
+    config.GUILD_ID: Tenant(config) for config in load_tenant_configs()
+}
+GUILD_IDS = list(TENANTS)
+
+
+def tenant_for(guild: Any) -> Tenant | None:
+    """Accepts a guild, a guild id, or None (direct messages)."""
+    if guild is None:
+        return None
+    return TENANTS.get(guild if isinstance(guild, int) else guild.id)
+
+
+QUEUE_DEPTH.set_function(lambda: {
+    (tenant.name,): len(tenant.cache.render_applications_queue)
+    for tenant in TENANTS.values()
+})
+VOTING_SLOT_AGE.set_function(lambda: {
+    (tenant.name,): (
+        time() - tenant.cache.app_being_voted_age if tenant.cache.app_being_voted else 0
+    )
+    for tenant in TENANTS.values()
+})
@@ -0,0 +1,202 @@
+"""
+Read-only JSON API over the in-memory state of every tenant.
+
+    GET /api/tenants
+    GET /api/<tenant>/queue
+    GET /api/<tenant>/tallies
+    GET /api/<tenant>/whitelist
+    GET /api/<tenant>/participation
+
+Responses carry an ETag made of the tenant's `Cache.version`, which only
+moves when a save or a load changes the state. A request whose
+If-None-Match still matches is answered with 304 from the server thread.
+Otherwise the view is rendered once per version on the event loop, the
+only place the state can be read consistently, and reused until the next
+change.
+"""
+from typing import Any, Callable
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import time
+import asyncio
+import json
+
+from ..db.cache import Cache
+from ..db.tenants import TENANTS, Tenant
+
+# seconds a request waits for the event loop to render a view
+RENDER_TIMEOUT = 5.0
+
+
+def _application(app_tuple) -> dict[str, Any]:
+    app, cid = app_tuple
+    return {
+        "app_id": app.app_id,
+        "app_key": app.app_key,
+        "discord_id": app.discord_id,
+        "title": app.title,
+        "cid": cid,
+    }
+
+
+def queue_view(cache: Cache) -> dict[str, Any]:
+    voting = None
+    if cache.app_being_voted:
+        voting = _application(cache.app_being_voted)
+        voting["voting_since"] = cache.app_being_voted_age
+    return {
+        "voting": voting,
+        "queue": [_application(app) for app in cache.render_applications_queue],
+    }
+
+
+def tallies_view(cache: Cache) -> dict[str, Any]:
+    application = None
+    if cache.app_being_voted:
+        app = cache.app_being_voted[0]
+        histogram = cache.weight_histograms.get(app.app_key)
+        application = {
+            "app_id": app.app_id,
+            "approvals": histogram.count if histogram else 0,
+            "median_weight": cache.median_weight(app.app_key),
+            "rejections": cache.rejection_counts.get(app.app_id, 0),
+        }
+    whitelisted = set(cache.current_whitelist)
+    removals = Counter(
+        key for keys in cache.removal_approvals.values() for key in keys
+        if key in whitelisted
+    )
+    return {"application": application, "removals": dict(removals)}
+
+
+def whitelist_view(cache: Cache) -> dict[str, Any]:
+    return {"whitelist": list(cache.current_whitelist)}
+
+
+def participation_view(cache: Cache) -> dict[str, Any]:
+    """Votes per nominator, on open subjects and on not yet archived decisions."""
+    counts: dict[str, Counter[str]] = {}
+
+    def count(user_id: str, kind: str, amount: int = 1) -> None:
+        counts.setdefault(user_id, Counter())[kind] += amount
+
+    for user_id, votes in cache.nomination_approvals.items():
+        count(user_id, "approvals", len(votes))
+    for user_id, app_ids in cache.rejection_approvals.items():
+        count(user_id, "rejections", len(app_ids))
+    for user_id, keys in cache.removal_approvals.items():
+        count(user_id, "removals", len(keys))
+    for record in cache.decided:
+        # approvals of a decided module are dropped from the votes above
+        if record["kind"] == "application":
+            for user_id in record["approvals"]:
+                count(user_id, "approvals")
+    return {
+        "participation": {
+            user_id: {
+                kind: counter[kind] for kind in ("approvals", "rejections", "removals")
+            }
+            for user_id, counter in counts.items()
+        }
+    }
+
+
+VIEWS: dict[str, Callable[[Cache], dict[str, Any]]] = {
+    "queue": queue_view,
+    "tallies": tallies_view,
+    "whitelist": whitelist_view,
+    "participation": participation_view,
+}
+
+
+class StateApi:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self._by_name = {tenant.name: tenant for tenant in TENANTS.values()}
+        self._tenants = json.dumps({"tenants": sorted(self._by_name)}).encode()
+        # (tenant, view) : (version, body)
+        self._rendered: dict[tuple[str, str], tuple[int, bytes]] = {}
+        self._lock = Lock()
+
+    def resolve(self, path: str) -> tuple[str, Callable[[], bytes]] | None:
+        """
+        Returns the etag and a body getter for a path, None if there is no
+        such view. The body is only needed when the client's copy is stale.
+        """
+        parts = path.split("?")[0].strip("/").split("/")
+        if parts == ["api", "tenants"]:
+            return '"tenants"', lambda: self._tenants
+        if len(parts) != 3 or parts[0] != "api":
+            return None
+        tenant = self._by_name.get(parts[1])
+        view = parts[2]
+        if tenant is None or view not in VIEWS:
+            return None
+        version = tenant.cache.version
+        return f'"{version}"', lambda: self._body(tenant, view, version)
+
+    def _body(self, tenant: Tenant, view: str, version: int) -> bytes:
+        with self._lock:
+            rendered = self._rendered.get((tenant.name, view))
+        if rendered is not None and rendered[0] == version:
+            return rendered[1]
+
+        async def render() -> bytes:
+            data = VIEWS[view](tenant.cache)
+            data["version"] = version
+            data["rendered_at"] = time()
+            return json.dumps(data).encode()
+
+        body = asyncio.run_coroutine_threadsafe(render(), self.loop).result(RENDER_TIMEOUT)
+        with self._lock:
+            self._rendered[(tenant.name, view)] = (version, body)
+        return body
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+def _handler(api: StateApi) -> type[BaseHTTPRequestHandler]:
+    class ApiHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            resolved = api.resolve(self.path)
+            if resolved is None:
+                self.send_error(404)
+                return
+            etag, get_body = resolved
+            if _matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            try:
+                body = get_body()
+            except TimeoutError:
+                self.send_error(503)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return ApiHandler
+
+
+def start_api_server(
+        host: str, port: int, loop: asyncio.AbstractEventLoop
+    ) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _handler(StateApi(loop)))
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name="api-server", daemon=True).start()
+    return server
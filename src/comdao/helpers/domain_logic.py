@@ -1,7 +1,8 @@
-from typing import Iterable, Sized, TypeVar, Protocol, Iterator, cast
-import statistics
+from typing import Any, Awaitable, Callable, Container, Iterable, Sized, TypeVar, Protocol, Iterator, cast
 import html
 import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from queue import Queue
 from time import time
 
@@ -12,11 +13,14 @@ from substrateinterface import Keypair
 from typeguard import check_type
 import asyncio
 
-from ..db.cache import Cache, NominationVote
-from ..config.settings import MNEMONIC, MAXIMUM_VOTING_AGE, ROLE_ID, BOT, DISCORD_PARAMS
+from ..db.cache import Cache
+from ..db.tenants import Tenant
+from ..db.leader import LEASE
+from ..config.settings import MAXIMUM_VOTING_AGE, BOT, DIGEST, IPFS, PUBLISHING
 from ..config.application import Application
+from ..config.loggers import LOGGER
 from .substrate_interface import send_call
-from .substrate_interface import get_applications
+from .substrate_interface import get_pending_applications
 
 from .ipfs import get_json_from_cid
 
@@ -32,6 +36,12 @@ class SizedIterable(Protocol[T]):
 
 RENDERED_APPLICATIONS_QUEUE = Queue[tuple[Application, str]]()
 APP_BEING_VOTED = None
+# titles are cut to this length in digests
+DIGEST_TITLE_CHARS = 80
+# resolves the proposals of several new applications at once
+_PROPOSALS = ThreadPoolExecutor(
+    max_workers=max(1, IPFS.FETCH_CONCURRENCY), thread_name_prefix="proposals"
+)
 
 def to_markdown(app_obj_tupl: tuple[Application, str], guild: discord.Guild):
    
@@ -42,19 +52,12 @@ def to_markdown(app_obj_tupl: tuple[Application, str], guild: discord.Guild):
     member = guild.get_member(int(applicant)) # type: ignore
     applicant = member.mention if member else str(applicant) + " (ID)"
     app_id = app_obj.app_id
-    unescaped_data = data.replace('\\n', '\n')
-    if unescaped_data:
-        # removes trailling quotes of json
-        if unescaped_data[0] == '"':
-            unescaped_data = unescaped_data[1:]
-        if unescaped_data[-1] == '"':
-            unescaped_data = unescaped_data[:-1]
     single_mark = (
         "> **New application!**\n"
         f"> Application key: **{key}**\n"
         f"> Applicant: User **{applicant}**\n"
         f"> Application ID: **{app_id}**\n"
-        f"> Data: \n{unescaped_data}\n"
+        f"> Data: \n{data}\n"
         "- - -"
     )
     if len(single_mark) > 4000:
@@ -70,123 +73,318 @@ def to_markdown(app_obj_tupl: tuple[Application, str], guild: discord.Guild):
 
 
 def to_markdown_list(app_obj_lst: list[tuple[Application, str]], guild: discord.Guild):
+    """One line per application, for digests; applicants aren't pinged."""
     markdowns: list[str] = []
-    for app_obj, cid in app_obj_lst:
+    for app_obj, _ in app_obj_lst:
         applicant = app_obj.discord_id
-        data = app_obj.body
-        key = app_obj.app_key
         member = guild.get_member(int(applicant)) # type: ignore
         applicant = member.name if member else str(applicant) + " (ID)"
-        app_id = app_obj.app_id
-        unescaped_data = data.replace('\\n', '\n')
-        if unescaped_data:
-            # removes trailling quotes of json
-            if unescaped_data[0] == '"':
-                unescaped_data = unescaped_data[1:]
-            if unescaped_data[-1] == '"':
-                unescaped_data = unescaped_data[:-1]
-        single_mark = (
-            "> **New application!**\n"
-            f"> Application key: **{key}**\n"
-            f"> Applicant: User **{applicant}**\n"
-            f"> Application ID: **{app_id}**\n"
-            f"> Data: \n{unescaped_data}\n"
-            "- - -"
-        )
-        if len(single_mark) > 4000:
-            new_data = f"Too large to display. You can [query the data via IPFS](https://ipfs.io/ipfs/{cid}) to see the full proposal."
-            single_mark = (
-            "> **New application!**\n"
-            f"> Application key: **{key}**\n"
-            f"> Applicant: User **{applicant}**\n"
-            f"> Data: {new_data}\n"
-            "- - -"
+        title = app_obj.title
+        if len(title) > DIGEST_TITLE_CHARS:
+            title = title[:DIGEST_TITLE_CHARS - 1] + "…"
+        markdowns.append(
+            f"> **{app_obj.app_id}** · {title} · `{app_obj.app_key}` · {applicant}"
         )
-        markdowns.append(single_mark)
     return markdowns
 
-def build_application_embeds(cache: Cache, guild: discord.Guild):
-    applications = get_new_pending_applications(cache)
+
+def paginate(lines: list[str], page_chars: int, max_pages: int) -> list[str]:
+    """
+    Packs lines into at most `max_pages` messages of `page_chars`, the
+    last one ends with how many lines were left out.
+    """
+    pages: list[str] = []
+    page: list[str] = []
+    size = 0
+    # room for the "and N more" line
+    budget = page_chars - 40
+    for index, line in enumerate(lines):
+        line = line[:budget]
+        if page and size + len(line) + 1 > budget:
+            pages.append("\n".join(page))
+            page, size = [], 0
+            if len(pages) == max_pages:
+                pages[-1] += f"\n…and {len(lines) - index} more"
+                return pages
+        page.append(line)
+        size += len(line) + 1
+    if page:
+        pages.append("\n".join(page))
+    return pages
+
+
+def _enqueue(
+        cache: Cache,
+        applications: list[tuple[Application, str]],
+        before_id: int | None = None,
+    ):
+    # callers hold the global section; with `before_id`, the applications go
+    # ahead of queued ones with a higher id, so older applications come first
+    position = len(cache.render_applications_queue)
+    if before_id is not None:
+        position = next(
+            (
+                index for index, (app, _) in enumerate(cache.render_applications_queue)
+                if app.app_id > before_id
+            ),
+            position,
+        )
+    fresh: list[tuple[Application, str]] = []
+    for app in applications:
+        app_obj = app[0]
+        if app_obj.app_id in cache.dao_applications:
+            continue
+        cache.dao_applications.append(app_obj.app_id) # type: ignore
+        cache.request_ids.append(app_obj.app_key)
+        cache.search.add(app_obj)
+        fresh.append(app)
+    if DIGEST.ENABLED:
+        cache.undigested.extend(app[0].app_id for app in fresh)
     # circumvents discord limitation of 25 fields per embed
-    with cache:
-        for app in applications:
-            cache.render_applications_queue.append(app)
+    cache.insert_applications(position, fresh)
+
+
+async def build_application_embeds(tenant: Tenant, guild: discord.Guild):
+    cache = tenant.cache
+    applications: list[tuple[Application, str]] = []
+    # while backfilling, applications up to `backfill_until` are the
+    # backfill's; nothing is ingested until that bound is known
+    if not cache.backfilling or cache.backfill_until is not None:
+        known_ids = set(cache.dao_applications)
+        floor = cache.backfill_until if cache.backfilling else None
+        # chain and IPFS reads happen in worker threads, outside of any lock
+        entries = await asyncio.to_thread(
+            list_new_pending_applications, known_ids, tenant.config.USE_TESTNET
+        )
+        if floor is not None:
+            entries = [app for app in entries if app["id"] > floor]
+        applications = await asyncio.to_thread(resolve_applications, entries)
+    return await claim_voting_slot(tenant, guild, applications)
+
+
+async def claim_voting_slot(
+        tenant: Tenant,
+        guild: discord.Guild,
+        applications: list[tuple[Application, str]] | None = None,
+    ):
+    """
+    Queues `applications`, then moves the next queued application into a
+    free voting slot. Returns its markdown and applicant, ("", None) if the
+    slot stays as it is.
+    """
+    cache = tenant.cache
+    expired_discord_id = ""
+    next_app: tuple[Application, str] | None = None
+    async with cache.locks.global_section():
+        _enqueue(cache, applications or [])
+        being_voted = cache.app_being_voted
         if (
-            cache.app_being_voted is not None and
-            time() - cache.app_being_voted_age > MAXIMUM_VOTING_AGE
+            being_voted is not None and
+            time() - cache.app_being_voted_age > MAXIMUM_VOTING_AGE and
+            # a vote on it is being executed right now
+            not cache.locks.application_busy(being_voted[0].app_id)
         ):
-            app_id = cache.app_being_voted[0].app_id
+            app_id = being_voted[0].app_id
             reffusal_message = (
                 f"Putting application {app_id} to end of queue because "
                 "the voting took too long"
             )
-            print(reffusal_message)
-            discord_user = cache.applicator_discord_id
-            if discord_user:
-                channel_id = DISCORD_PARAMS.REQUEST_CHANNEL_ID
-                channel = asyncio.run(BOT.fetch_channel(channel_id))  # as integer
-                channel = check_type(channel, discord.channel.TextChannel)
-                role = guild.get_role(ROLE_ID)
-                role = check_type(role, discord.Role)
-                overwrites = channel.overwrites # type: ignore just one more ignore bro
-                overwrites[discord_user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
-                asyncio.run(channel.edit(overwrites=overwrites)) # type: ignore I HATE pycord
-
-            cache.render_applications_queue.append(cache.app_being_voted)
+            LOGGER.info(reffusal_message, extra={"tenant": tenant.name})
+            expired_discord_id = cache.applicator_discord_id
+            cache.insert_applications(len(cache.render_applications_queue), [being_voted])
             cache.app_being_voted = None
             cache.app_being_voted_age = time()
         if (
             not cache.app_being_voted and 
             len(cache.render_applications_queue) > 0
         ):
-            cache.app_being_voted = cache.render_applications_queue.pop(0)
+            next_app = cache.pop_next_application()
+            cache.app_being_voted = next_app
             cache.app_being_voted_age = time()
-            being_voted = cast(tuple[Application, str], cache.app_being_voted)
-            discord_user_id = being_voted[0].discord_id
-            markdown = to_markdown(being_voted, guild)
-            cache.applicator_discord_id = discord_user_id
-            return markdown, discord_user_id
-        else:
-            return "", None
-
-
-def get_new_pending_applications(cache: Cache):
-    applications = get_applications()
-    pending: list[tuple[Application, str]] = []
-    for app in applications.values():
-        try:
-            app_id = app["id"]
-            app_status = app["status"]
-            cid = app["data"].split("ipfs://")[-1]
-            proposal_dict = get_json_from_cid(cid)
-            if not proposal_dict:
-                continue
-            ss58_key = app["user_id"]
-            assert is_ss58_address(ss58_key)
-            application_obj = Application(
-                discord_id=proposal_dict["discord_id"],
-                title=proposal_dict["title"],
-                body=json.dumps(proposal_dict["body"]),
-                app_id=app_id, # type: ignore,
-                app_key=ss58_key
-            )
-            if app_status.lower() == "pending":
-                if app_id not in cache.dao_applications:
-                    cache.dao_applications.append(app_id)
-                    cache.request_ids.append(ss58_key)
-                    pending.append((application_obj, cid))
-        except Exception as e:
-            print(e)
-            continue
+            cache.applicator_discord_id = next_app[0].discord_id
+
+    markdown = ""
+    if next_app is not None:
+        markdown = tenant.prerendered.pop(next_app[0].app_id, "") or to_markdown(next_app, guild)
+    prerender_next(tenant, guild)
+    if expired_discord_id:
+        await revoke_request_channel_access(
+            guild, tenant.config.REQUEST_CHANNEL_ID, expired_discord_id
+        )
+    if next_app is not None:
+        return markdown, next_app[0].discord_id
+    return "", None
+
+
+def prerender_next(tenant: Tenant, guild: discord.Guild):
+    """
+    Renders the next `PUBLISHING.LOOKAHEAD` queued applications, and their
+    applicant lookups, so a freed slot is filled without that work.
+    """
+    upcoming = tenant.cache.render_applications_queue[:max(0, PUBLISHING.LOOKAHEAD)]
+    tenant.prerendered = {
+        app[0].app_id: tenant.prerendered.get(app[0].app_id) or to_markdown(app, guild)
+        for app in upcoming
+    }
+
+
+async def build_digest(tenant: Tenant, guild: discord.Guild):
+    """
+    Pages listing the applications queued since the last digest, and the
+    ids to pass to `mark_digested` once the pages are posted. The
+    application that just took the voting slot is posted in full instead.
+    """
+    cache = tenant.cache
+    async with cache.locks.global_section():
+        undigested = list(cache.undigested)
+        if not undigested:
+            return [], undigested
+        wanted = set(undigested)
+        queued = [app for app in cache.render_applications_queue if app[0].app_id in wanted]
+    if not queued:
+        return [], undigested
+    lines = to_markdown_list(queued, guild)
+    pages = paginate(lines, DIGEST.PAGE_CHARS - 100, max(1, DIGEST.MAX_PAGES))
+    header = f"**{len(queued)} new application(s) queued**"
+    pages = [
+        f"{header} ({number}/{len(pages)})\n{page}" if len(pages) > 1 else f"{header}\n{page}"
+        for number, page in enumerate(pages, start=1)
+    ]
+    return pages, undigested
+
+
+async def mark_digested(cache: Cache, app_ids: list[int]):
+    done = set(app_ids)
+    async with cache.locks.global_section():
+        cache.undigested = [app_id for app_id in cache.undigested if app_id not in done]
+
+
+async def revoke_request_channel_access(
+        guild: discord.Guild, channel_id: int, discord_id: str
+    ):
+    member = guild.get_member(int(discord_id))
+    if member is None:
+        return
+    channel = await BOT.fetch_channel(channel_id)  # as integer
+    channel = check_type(channel, discord.channel.TextChannel)
+    overwrites = channel.overwrites # type: ignore just one more ignore bro
+    overwrites[member] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
+    await channel.edit(overwrites=overwrites) # type: ignore I HATE pycord
+
+
+async def settle_voting_slot(tenant: Tenant):
+    """
+    Frees the voting slot if its application is no longer pending on chain,
+    i.e. a previous leader submitted the outcome but stopped before saving.
+    """
+    cache = tenant.cache
+    being_voted = cache.app_being_voted
+    if being_voted is None:
+        return
+    pending = await asyncio.to_thread(get_pending_applications, tenant.config.USE_TESTNET)
+    app_id = being_voted[0].app_id
+    if any(app["id"] == app_id for app in pending):
+        return
+    async with cache.locks.global_section():
+        if cache.app_being_voted is being_voted:
+            cache.app_being_voted = None
+            cache.app_being_voted_age = 0
+
+
+async def backfill_applications(
+        tenant: Tenant,
+        on_chunk: Callable[[], Awaitable[None]] | None = None,
+    ):
+    """
+    Ingests the applications that were pending when the state started from
+    scratch, `IPFS.BACKFILL_CHUNK` at a time. Every chunk is saved before
+    the next one, so an interrupted backfill resumes where it stopped, and
+    the tick keeps ingesting newer applications meanwhile.
+    """
+    cache = tenant.cache
+    use_testnet = tenant.config.USE_TESTNET
+    entries = await asyncio.to_thread(
+        list_new_pending_applications, set(cache.dao_applications), use_testnet
+    )
+    if cache.backfill_until is None:
+        async with cache.locks.global_section():
+            cache.backfill_until = entries[-1]["id"] if entries else -1
+        await cache.persist()
+    until = cache.backfill_until
+    assert until is not None
+    entries = [app for app in entries if app["id"] <= until]
+    chunk_size = max(1, IPFS.BACKFILL_CHUNK)
+    for start in range(0, len(entries), chunk_size):
+        # a standby must not write the state file
+        if not LEASE.is_leader:
+            return
+        resolved = await asyncio.to_thread(
+            resolve_applications, entries[start:start + chunk_size]
+        )
+        async with cache.locks.global_section():
+            _enqueue(cache, resolved, before_id=until)
+        await cache.persist()
+        LOGGER.info(
+            f"Backfill of {tenant.name}: "
+            f"{min(start + chunk_size, len(entries))}/{len(entries)} applications"
+        )
+        if on_chunk is not None:
+            await on_chunk()
+    async with cache.locks.global_section():
+        cache.backfilling = False
+        cache.backfill_until = None
+    await cache.persist()
+
+
+def list_new_pending_applications(known_ids: Container[int], use_testnet: bool):
+    """Blocking; chain entries of pending applications not in `known_ids`, by id."""
+    pending = [
+        app for app in get_pending_applications(use_testnet) if app["id"] not in known_ids
+    ]
+    pending.sort(key=lambda app: app["id"])
     return pending
 
 
-def get_votes_threshold(ctx: discord.ApplicationContext):
+def resolve_application(app: dict[str, Any]) -> tuple[Application, str] | None:
+    """Blocking; fetches the proposal of a chain entry, None if unusable."""
+    try:
+        cid = app["data"].split("ipfs://")[-1]
+        proposal_dict = get_json_from_cid(cid)
+        if not proposal_dict:
+            return None
+        ss58_key = app["user_id"]
+        assert is_ss58_address(ss58_key)
+        # stored as it will be displayed
+        body = proposal_dict["body"]
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        application_obj = Application(
+            discord_id=proposal_dict["discord_id"],
+            title=proposal_dict["title"],
+            body=body,
+            app_id=app["id"], # type: ignore,
+            app_key=ss58_key
+        )
+        return application_obj, cid
+    except Exception as e:
+        LOGGER.warning(
+            f"Skipping application {app.get('id')}: {e!r}", extra={"app_id": app.get("id")}
+        )
+        return None
+
+
+def resolve_applications(apps: list[dict[str, Any]]) -> list[tuple[Application, str]]:
+    """Blocking; resolves the proposals concurrently, keeping the order."""
+    resolved = _PROPOSALS.map(resolve_application, apps)
+    return [app for app in resolved if app is not None]
+
+
+def get_votes_threshold(ctx: discord.ApplicationContext, role_id: int):
     guild = ctx.guild
     #guild = discord.Client().get_guild(919913039682220062)
     guild = check_type(guild, discord.Guild)
     #nominators = discord.utils.get(guild.roles, name=ROLE_NAME)
-    nominators = guild.get_role(ROLE_ID)
+    nominators = guild.get_role(role_id)
     nominators = check_type(nominators, discord.Role)
     signatores_count = len(nominators.members)
     threshold = signatores_count // 2 + 1
@@ -232,47 +430,38 @@ async def valid_for_approval(
     return True
 
 
+# The add_*_vote helpers never await, so they run atomically on the event
+# loop. Callers hold the application (or module) lock around the whole
+# vote so the count and the chain call that follows it stay consistent.
 def add_approval_vote(
         cache: Cache, 
         user_id: str, 
         module_key: Ss58Address,
         recommended_weight: int
     ):
-    with cache:
-        approvals_by_user = cache.nomination_approvals.get(user_id, [])
-        approvals_by_user.append(NominationVote(module_key, recommended_weight))
-        cache.nomination_approvals[user_id] = approvals_by_user
-
-        agreement_count = 0
-        for votes in cache.nomination_approvals.values():
-            for vote in votes:
-                if vote.module_key == module_key:
-                    agreement_count += 1
-        
-    return agreement_count
+    return cache.add_nomination_vote(user_id, module_key, recommended_weight)
 
 
-async def push_to_white_list(cache: Cache, module_key: Ss58Address):
-    assert MNEMONIC is not None
-    current_keypair = Keypair.create_from_mnemonic(MNEMONIC)
+async def push_to_white_list(tenant: Tenant, application: Application):
+    # callers hold `tenant.cache.locks.module(application.app_key)`
+    cache = tenant.cache
+    module_key = application.app_key
+    current_keypair = Keypair.create_from_mnemonic(tenant.config.MNEMONIC)
     # update the whitelist
     fn = "add_to_whitelist"
-    recommended_weights: list[int] = []
-    for user_approvals in cache.nomination_approvals.values():
-        for user_vote in user_approvals:
-            if user_vote.module_key == module_key:
-                recommended_weights.append(user_vote.recommended_weight)
-
-    weight = statistics.median(recommended_weights)
+    weight = cache.median_weight(module_key)
+    if weight is None:
+        LOGGER.warning(f"Module {module_key} has no approval votes.")
+        return
     call = {"module_key": module_key, "recommended_weight": weight}
-    wlr = await send_call(fn, current_keypair, call)
-    print(wlr)
-    # Acquire the lock before modifying nomination_approvals
-    with cache:
+    wlr = await send_call(
+        fn, current_keypair, call, use_testnet=tenant.config.USE_TESTNET
+    )
+    async with cache.locks.global_section():
         cache.current_whitelist.append(module_key)
-        for user_id in list(cache.nomination_approvals.keys()):
-            cache.nomination_approvals[user_id].remove(module_key) # type: ignore
-    print(f"Module {module_key} added to whitelist.")
+        cache.record_application_decision(application, "accepted")
+        cache.drop_nomination_votes(module_key)
+    LOGGER.info(f"Module {module_key} added to whitelist.", extra={"tenant": tenant.name})
 
 
 async def valid_for_rejection(
@@ -297,17 +486,7 @@ def add_rejection_vote(
         user_id: str,
         application_id: int,
     ):
-    with cache:
-        rejected_by_user = cache.rejection_approvals.get(user_id, [])
-        rejected_by_user.append(application_id)
-        cache.rejection_approvals[user_id] = rejected_by_user
-
-        reffusal_count = 0
-        for votes in cache.rejection_approvals.values():
-            for vote in votes:
-                if vote == application_id:
-                    reffusal_count += 1
-        return reffusal_count
+    return cache.add_rejection_vote(user_id, application_id)
 
 
 async def valid_for_removal(
@@ -346,30 +525,102 @@ def add_removal_vote(
     module_key: Ss58Address
 ):
     agreement_count = 0
-    with cache:
-        removals = cache.removal_approvals.get(user_id, [])
-        removals.append(module_key)
-        cache.removal_approvals[user_id] = removals
-
-        for removal_list in cache.removal_approvals.values():
-            for module in removal_list:
-                if module == module_key:
-                    agreement_count += 1
+    removals = cache.removal_approvals.get(user_id, [])
+    removals.append(module_key)
+    cache.removal_approvals[user_id] = removals
+
+    for removal_list in cache.removal_approvals.values():
+        for module in removal_list:
+            if module == module_key:
+                agreement_count += 1
     return agreement_count
 
 
-async def pop_from_whitelist(cache: Cache, module_key: Ss58Address):
-    assert MNEMONIC is not None
-    current_keypair = Keypair.create_from_mnemonic(MNEMONIC)
+async def pop_from_whitelist(tenant: Tenant, module_key: Ss58Address):
+    # callers hold `tenant.cache.locks.module(module_key)`
+    cache = tenant.cache
+    current_keypair = Keypair.create_from_mnemonic(tenant.config.MNEMONIC)
     # update the whitelist
     fn = "remove_from_whitelist"
     call = {"module_key": module_key}
-    await send_call(fn, current_keypair, call)
-    with cache:
+    await send_call(
+        fn, current_keypair, call, use_testnet=tenant.config.USE_TESTNET
+    )
+    async with cache.locks.global_section():
         cache.current_whitelist.remove(module_key)
+        cache.record_removal(module_key)
+
+
+def decision_summary(record: dict[str, Any]) -> str:
+    decided_at = datetime.fromtimestamp(record["decided_at"], timezone.utc)
+    when = decided_at.strftime("%Y-%m-%d %H:%M UTC")
+    if record["kind"] == "removal":
+        return (
+            f"Module `{record['subject']}` {record['outcome']} on {when} "
+            f"with {len(record['votes'])} votes."
+        )
+    return (
+        f"Application {record['subject']} ({record['title']}, `{record['app_key']}`) "
+        f"{record['outcome']} on {when} with {len(record['approvals'])} approvals "
+        f"and {len(record['rejections'])} rejections."
+    )
+
+def application_status(cache: Cache, subject: str, threshold: int) -> str | None:
+    """Where a pending application stands, None if it isn't pending."""
+    app_id = cache.pending_app_id(subject)
+    if app_id is None:
+        return None
+    position = cache.queue_position(app_id)
+    if position is not None:
+        app = cache.render_applications_queue[position - 1][0]
+        return (
+            f"Application {app_id} ({app.title}, `{app.app_key}`) is number "
+            f"{position} of {len(cache.render_applications_queue)} in the queue."
+        )
+    assert cache.app_being_voted
+    app = cache.app_being_voted[0]
+    minutes = int((time() - cache.app_being_voted_age) // 60)
+    histogram = cache.weight_histograms.get(app.app_key)
+    approvals = histogram.count if histogram else 0
+    median = cache.median_weight(app.app_key)
+    weight = f" (median weight {median})" if median is not None else ""
+    return (
+        f"Application {app_id} ({app.title}, `{app.app_key}`) is being voted on "
+        f"for {minutes} minutes: {approvals} approvals{weight} and "
+        f"{cache.rejection_counts.get(app_id, 0)} rejections, "
+        f"{threshold} needed either way."
+    )
+
+
+def search_applications(cache: Cache, query: str, limit: int = 10) -> list[str]:
+    """One line per matching application, with where it stands."""
+    results = cache.search.search(query, limit)
+    if not results:
+        return []
+    queued = {app.app_id for app, _ in cache.render_applications_queue}
+    voting = cache.app_being_voted[0].app_id if cache.app_being_voted else None
+    outcomes = {
+        record["subject"]: record["outcome"] for record in cache.decided
+        if record["kind"] == "application"
+    }
+    lines: list[str] = []
+    for app_id, (title, app_key, discord_id) in results:
+        if len(title) > DIGEST_TITLE_CHARS:
+            title = title[:DIGEST_TITLE_CHARS - 1] + "…"
+        if app_id == voting:
+            status = "being voted"
+        elif app_id in queued:
+            status = "queued"
+        else:
+            # archived outcomes are one `/history` away
+            status = outcomes.get(app_id, "decided")
+        lines.append(
+            f"Application {app_id} ({title}, `{app_key}`) by <@{discord_id}>: {status}."
+        )
+    return lines
 
 if __name__ == "__main__":
 #    applications = get_applications()
 #    print(applications)
-    ths = get_votes_threshold("afsds") # type: ignore
+    ths = get_votes_threshold("afsds", 0) # type: ignore
     print(ths)
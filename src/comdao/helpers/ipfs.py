@@ -1,17 +1,304 @@
-from typing import Any
+from typing import Any, Iterable
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from time import monotonic, perf_counter
+import codecs
+import json
 import requests
+import ipfshttpclient
+
+from ..config.settings import IPFS
+from .metrics import IPFS_FETCH_SECONDS
+
+# weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.3
+# latency assumed for a gateway that was never used
+UNKNOWN_LATENCY = 1.0
+# seconds to skip the local daemon after it failed to answer
+LOCAL_NODE_BACKOFF = 30.0
+CHUNK_SIZE = 8192
+PROPOSAL_FIELDS = ("discord_id", "title", "body")
+_DECODER = json.JSONDecoder()
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+# returned instead of a document when the size cap was hit; every gateway
+# serves the same bytes, so there is no point in asking the others
+TOO_LARGE: dict[Any, Any] = {}
+
+
+class ProposalParser:
+    """
+    Incremental parser for the top level JSON object of a proposal.
+
+    Only `PROPOSAL_FIELDS` are kept, other members are parsed and dropped, and
+    `feed` reports when every wanted field was seen so the download can stop
+    before the rest of the document arrives.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, Any] = {}
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"
+        self._key = ""
+
+    @property
+    def done(self) -> bool:
+        return self._state == "end" or len(self.fields) == len(PROPOSAL_FIELDS)
+
+    def feed(self, chunk: bytes, final: bool = False) -> bool:
+        self._buffer += self._text.decode(chunk, final)
+        self._parse(final)
+        return self.done
+
+    def result(self) -> dict[str, Any] | None:
+        return self.fields if self.done else None
+
+    def _parse(self, final: bool) -> None:
+        buffer = self._buffer
+        pos = 0
+        while not self.done:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError("proposal is not a JSON object")
+                pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if char == "}":
+                    self._state = "end"
+                    break
+                if char != '"':
+                    raise ValueError(f"unexpected {char!r} in proposal")
+                try:
+                    self._key, pos = _DECODER.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break
+                self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError(f"unexpected {char!r} in proposal")
+                pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                try:
+                    value, end = _DECODER.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError("truncated proposal")
+                    break
+                # a number or literal at the end of the buffer may go on
+                if end == len(buffer) and not final and char not in '"{[':
+                    break
+                if self._key in PROPOSAL_FIELDS:
+                    self.fields[self._key] = value
+                pos = end
+                self._state = "comma"
+            elif self._state == "comma":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "end"
+                else:
+                    raise ValueError(f"unexpected {char!r} in proposal")
+                pos += 1
+        self._buffer = buffer[pos:]
+
+
+def read_proposal(chunks: Iterable[bytes], max_bytes: int) -> dict[str, Any] | None:
+    parser = ProposalParser()
+    received = 0
+    for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise DocumentTooLarge(f"proposal is over {max_bytes} bytes")
+        if parser.feed(chunk):
+            return parser.result()
+    parser.feed(b"", final=True)
+    return parser.result()
+
+
+class GatewayStats:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.latency = UNKNOWN_LATENCY
+        self.error_rate = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.latency += EWMA_ALPHA * (latency - self.latency)
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    @property
+    def score(self) -> float:
+        # a gateway failing half of the time counts as three times slower
+        return self.latency * (1 + 4 * self.error_rate)
+
+
+class ProposalRetriever:
+    """
+    Resolves proposal documents: the local IPFS daemon and the best ranked
+    HTTP gateways raced against each other, then the rest of the gateways.
+    """
+
+    def __init__(
+            self,
+            api_addr: str,
+            gateways: list[str],
+            race_width: int = 3,
+            timeout: float = 20,
+            max_bytes: int = 256 * 1024,
+            cache_bytes: int = 0,
+            local_timeout: float = 5,
+    ) -> None:
+        self.api_addr = api_addr
+        self.local_timeout = local_timeout
+        self._client: ipfshttpclient.Client | None = None
+        self._client_lock = Lock()
+        self.max_bytes = max_bytes
+        self.race_width = max(1, race_width)
+        self.timeout = timeout
+        self.gateways = [GatewayStats(url) for url in gateways]
+        self._stats_lock = Lock()
+        self._local_down_until = 0.0
+        self._session = requests.Session()
+        # cid : (proposal, size); CIDs are content addressed, so entries
+        # never go stale and tenants on either network can share them
+        self._documents: OrderedDict[str, tuple[dict[Any, Any], int]] = OrderedDict()
+        self._documents_lock = Lock()
+        self._cache_bytes = cache_bytes
+        self._cached_bytes = 0
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(4, 2 * len(gateways) + 1), thread_name_prefix="ipfs"
+        )
+
+    def ranked_gateways(self) -> list[GatewayStats]:
+        with self._stats_lock:
+            return sorted(self.gateways, key=lambda gateway: gateway.score)
+
+    def get_proposal(self, cid: str) -> dict[str, Any] | None:
+        with self._documents_lock:
+            cached = self._documents.get(cid)
+            if cached is not None:
+                self._documents.move_to_end(cid)
+                return cached[0]
+        document = None
+        ranked = self.ranked_gateways()
+        for start in range(0, max(len(ranked), 1), self.race_width):
+            # only the first round races the daemon, it won't have the CID later
+            document = self._race(cid, ranked[start:start + self.race_width], start == 0)
+            if document is not None:
+                break
+        if document is TOO_LARGE:
+            return None
+        if document is not None:
+            self._remember(cid, document)
+        return document
+
+    def _remember(self, cid: str, document: dict[Any, Any]) -> None:
+        size = len(cid) + sum(len(str(value)) for value in document.values())
+        if size > self._cache_bytes:
+            return
+        with self._documents_lock:
+            if cid in self._documents:
+                return
+            self._documents[cid] = (document, size)
+            self._cached_bytes += size
+            while self._cached_bytes > self._cache_bytes:
+                _, (_, evicted) = self._documents.popitem(last=False)
+                self._cached_bytes -= evicted
+
+    @property
+    def local_node_up(self) -> bool:
+        return bool(self.api_addr) and monotonic() >= self._local_down_until
+
+    def _local_client(self) -> ipfshttpclient.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = ipfshttpclient.Client(self.api_addr, timeout=self.local_timeout)
+            return self._client
+
+    def _from_local_node(self, cid: str) -> dict[Any, Any] | None:
+        try:
+            payload = self._local_client().cat(cid, length=self.max_bytes + 1)
+            return read_proposal([payload], self.max_bytes)
+        except DocumentTooLarge:
+            return TOO_LARGE
+        except Exception:
+            # down, hanging or without the CID: the gateways answer meanwhile
+            with self._client_lock:
+                self._client = None
+            self._local_down_until = monotonic() + LOCAL_NODE_BACKOFF
+            return None
+
+    def _race(
+            self,
+            cid: str,
+            gateways: list[GatewayStats],
+            local_node: bool = False,
+        ) -> dict[Any, Any] | None:
+        pending: set[Future[dict[Any, Any] | None]] = {
+            self._pool.submit(self._from_gateway, gateway, cid) for gateway in gateways
+        }
+        if local_node and self.local_node_up:
+            pending.add(self._pool.submit(self._from_local_node, cid))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                document = future.result()
+                if document is not None:
+                    # losers keep running in the pool and still update the ranking
+                    return document
+        return None
+
+    def _from_gateway(self, gateway: GatewayStats, cid: str) -> dict[Any, Any] | None:
+        start = perf_counter()
+        document = None
+        try:
+            with self._session.get(
+                gateway.url + cid, timeout=self.timeout, stream=True
+            ) as result:
+                declared = int(result.headers.get("Content-Length") or 0)
+                if declared > self.max_bytes:
+                    raise DocumentTooLarge(f"proposal is {declared} bytes")
+                if result.ok:
+                    chunks = result.iter_content(CHUNK_SIZE)
+                    document = read_proposal(chunks, self.max_bytes)
+        except DocumentTooLarge:
+            document = TOO_LARGE
+        except Exception:
+            pass
+        with self._stats_lock:
+            gateway.record(perf_counter() - start, document is not None)
+        return document
+
+
+RETRIEVER = ProposalRetriever(
+    IPFS.API_ADDR, IPFS.GATEWAYS, IPFS.RACE_WIDTH, IPFS.TIMEOUT,
+    IPFS.MAX_DOCUMENT_BYTES, IPFS.CACHE_BYTES, IPFS.LOCAL_TIMEOUT,
+)
 
 
 def get_json_from_cid(cid: str) -> dict[Any, Any] | None:
     cid = cid.split("ipfs://")[-1]
-    gateway = "https://ipfs.io/ipfs/"
+    start = perf_counter()
+    outcome = "error"
     try:
-        result = requests.get(gateway + cid)
-        if result.ok:
-            return result.json()
-        return None
+        document = RETRIEVER.get_proposal(cid)
+        outcome = "ok" if document is not None else "miss"
+        return document
     except Exception as e:
         return None
+    finally:
+        IPFS_FETCH_SECONDS.observe(perf_counter() - start, outcome=outcome)
 
 if __name__ == "__main__":
     #result = get_json_from_cid("QmPLgRGEcDbDJCmocM91yes6iBg49QvC7qdQcvRb4vVSMX")
@@ -20,4 +307,4 @@ if __name__ == "__main__":
 
 
 
-    # {'discord_id': '919913039682220062', 'title': 'test', 'body': "# Plz accept my"}    
\ No newline at end of file
+    # {'discord_id': '919913039682220062', 'title': 'test', 'body': "# Plz accept my"}
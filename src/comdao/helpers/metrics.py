@@ -0,0 +1,274 @@
+"""
+Prometheus metrics for the bot.
+
+Recording is a dict lookup and a couple of additions under a per-metric lock;
+all formatting, and the evaluation of gauges, happens only when `/metrics`
+is scraped.
+"""
+from typing import Any, Callable, Iterator, TypeVar, ParamSpec, Coroutine
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter
+
+from ..config.loggers import correlated
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labels: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # per label set: [count per bucket..., +Inf count, sum]
+        self._series: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        lines: list[str] = []
+        for key, values in series:
+            cumulative = 0.0
+            bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, values[:-1]):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    Gauge whose value is computed by a callback at scrape time. With labels
+    the callback returns a dict of label values to value.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._function: Callable[[], Any] = lambda: {} if labels else 0
+
+    def set_function(self, function: Callable[[], Any]) -> None:
+        self._function = function
+
+    def samples(self) -> list[str]:
+        values = self._function()
+        if not self.label_names:
+            values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(float(value))}"
+            for key, value in values.items()
+        ]
+
+
+REGISTRY: list[Metric] = []
+
+COMMAND_SECONDS = Histogram(
+    "comdao_command_duration_seconds",
+    "Time spent handling a slash command.",
+    ("command",),
+)
+COMMAND_ERRORS = Counter(
+    "comdao_command_errors_total",
+    "Slash command invocations that raised.",
+    ("command",),
+)
+CHAIN_CALL_SECONDS = Histogram(
+    "comdao_chain_call_duration_seconds",
+    "Time spent in CommuneClient calls.",
+    ("call", "target"),
+)
+CHAIN_CALL_ERRORS = Counter(
+    "comdao_chain_call_errors_total",
+    "CommuneClient calls that raised.",
+    ("call", "target"),
+)
+STORAGE_MAP_READS = Counter(
+    "comdao_storage_reads_total",
+    "Storage map reads by how they were served: fresh (within the TTL), "
+    "hit (same block), collapsed (joined an in-flight read) or miss.",
+    ("storage", "outcome"),
+)
+IPFS_FETCH_SECONDS = Histogram(
+    "comdao_ipfs_fetch_duration_seconds",
+    "Time spent fetching a proposal document from IPFS.",
+    ("outcome",),
+)
+PERSISTENCE_SECONDS = Histogram(
+    "comdao_persistence_duration_seconds",
+    "Time spent saving or loading the state file.",
+    ("operation",),
+)
+LOCK_WAIT_SECONDS = Histogram(
+    "comdao_lock_wait_seconds",
+    "Time spent waiting for a cache lock.",
+    ("scope",),
+)
+QUEUE_DEPTH = Gauge(
+    "comdao_application_queue_depth",
+    "Applications waiting for a voting slot.",
+    ("tenant",),
+)
+VOTING_SLOT_AGE = Gauge(
+    "comdao_voting_slot_age_seconds",
+    "Age of the application currently being voted on, 0 if the slot is free.",
+    ("tenant",),
+)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+T = TypeVar('T')
+P = ParamSpec("P")
+def track_command(name: str):
+    def decorator(func: Callable[P, Coroutine[Any, Any, T]]) -> Callable[P, Coroutine[Any, Any, T]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            start = perf_counter()
+            try:
+                with correlated(name):
+                    return await func(*args, **kwargs)
+            except Exception:
+                COMMAND_ERRORS.inc(command=name)
+                raise
+            finally:
+                COMMAND_SECONDS.observe(perf_counter() - start, command=name)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def track_chain_call(call: str, target: str) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    except Exception:
+        CHAIN_CALL_ERRORS.inc(call=call, target=target)
+        raise
+    finally:
+        CHAIN_CALL_SECONDS.observe(perf_counter() - start, call=call, target=target)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
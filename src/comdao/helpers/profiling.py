@@ -0,0 +1,185 @@
+"""
+On-demand sampling profiler and event-loop stall detector.
+
+Nothing here runs until `profile` is awaited: a session starts a sampler
+thread that records the event-loop thread's stack at a fixed interval, plus a
+heartbeat task on the loop. When the heartbeat is late by more than the stall
+threshold, the sampler attributes the stall to the task that is running.
+"""
+from typing import Any
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter, sleep
+from types import FrameType
+
+MAX_PROFILE_SECONDS = 600
+SAMPLE_INTERVAL = 0.005
+HEARTBEAT_INTERVAL = 0.02
+STALL_THRESHOLD = 0.1
+PROFILE_DIR = "./profiles"
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+@dataclass
+class Stall:
+    task: str
+    duration: float
+    stack: str
+
+
+@dataclass
+class ProfileReport:
+    duration: float
+    samples: int
+    stacks: Counter[str] = field(default_factory=Counter)
+    stalls: list[Stall] = field(default_factory=list)
+    dump_path: str = ""
+
+    def hot_spots(self, limit: int = 10) -> list[tuple[str, int, int]]:
+        """Frames ranked by self samples, with their inclusive samples."""
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+    def stalls_by_task(self) -> list[tuple[str, int, float, float]]:
+        grouped: dict[str, list[float]] = {}
+        for stall in self.stalls:
+            grouped.setdefault(stall.task, []).append(stall.duration)
+        rows = [
+            (task, len(durations), sum(durations), max(durations))
+            for task, durations in grouped.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [
+            f"Profiled {self.duration:.1f}s, {self.samples} samples, "
+            f"{len(self.stalls)} event loop stalls over {STALL_THRESHOLD * 1000:.0f}ms."
+        ]
+        if self.samples:
+            lines.append("Top hot spots (self %, total %):")
+            for frame, own, total in self.hot_spots(limit):
+                lines.append(
+                    f"  {own * 100 / self.samples:5.1f}% "
+                    f"{total * 100 / self.samples:5.1f}%  {frame}"
+                )
+        stalls = self.stalls_by_task()
+        if stalls:
+            lines.append("Stalls by task (count, total ms, max ms):")
+            for task, count, total, longest in stalls[:limit]:
+                lines.append(f"  {count:3d} {total * 1000:8.1f} {longest * 1000:8.1f}  {task}")
+        return "\n".join(lines)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse(frame: FrameType | None) -> str:
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _task_name(loop: asyncio.AbstractEventLoop) -> str:
+    task = asyncio.current_task(loop)
+    if task is None:
+        return "<loop callbacks>"
+    coro: Any = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class _Session:
+    def __init__(self, loop: asyncio.AbstractEventLoop, duration: float) -> None:
+        self.loop = loop
+        self.duration = duration
+        self.loop_thread = threading.get_ident()
+        self.report = ProfileReport(duration=duration, samples=0)
+        self.last_beat = perf_counter()
+        self.stopped = threading.Event()
+
+    async def heartbeat(self) -> None:
+        while not self.stopped.is_set():
+            self.last_beat = perf_counter()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def sample(self) -> None:
+        stall_start: float | None = None
+        stall_task = ""
+        stall_stack = ""
+        while not self.stopped.is_set():
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = _collapse(frame)
+            self.report.stacks[stack] += 1
+            self.report.samples += 1
+
+            late = perf_counter() - self.last_beat - HEARTBEAT_INTERVAL
+            if late > STALL_THRESHOLD:
+                if stall_start is None:
+                    stall_start = self.last_beat
+                    stall_task = _task_name(self.loop)
+                    stall_stack = stack
+            elif stall_start is not None:
+                self.report.stalls.append(
+                    Stall(stall_task, self.last_beat - stall_start, stall_stack)
+                )
+                stall_start = None
+            sleep(SAMPLE_INTERVAL)
+
+
+_ACTIVE = threading.Lock()
+
+
+def _write_dump(report: ProfileReport) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(PROFILE_DIR, f"profile-{stamp}.txt")
+    with open(path, "w") as file:
+        # collapsed stacks, loadable by flamegraph.pl / speedscope
+        for stack, count in report.stacks.most_common():
+            file.write(f"{stack} {count}\n")
+        for stall in report.stalls:
+            file.write(
+                f"# stall {stall.duration * 1000:.1f}ms in {stall.task}: {stall.stack}\n"
+            )
+    return path
+
+
+async def profile(duration: float) -> ProfileReport:
+    """Profile the running event loop for `duration` seconds."""
+    duration = max(1.0, min(float(duration), MAX_PROFILE_SECONDS))
+    if not _ACTIVE.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running.")
+    try:
+        session = _Session(asyncio.get_running_loop(), duration)
+        heartbeat = asyncio.create_task(session.heartbeat(), name="profiler-heartbeat")
+        sampler = threading.Thread(target=session.sample, name="profiler", daemon=True)
+        started = perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            session.stopped.set()
+            await heartbeat
+            await asyncio.to_thread(sampler.join)
+        session.report.duration = perf_counter() - started
+        session.report.dump_path = await asyncio.to_thread(_write_dump, session.report)
+        return session.report
+    finally:
+        _ACTIVE.release()
@@ -1,3 +1,11 @@
+from typing import Any, Callable, Iterator, Sized
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+import asyncio
+
 from communex.client import CommuneClient
 from communex.types import Ss58Address
 from substrateinterface import Keypair
@@ -6,25 +14,197 @@ from communex.compat.key import classic_load_key
 from communex._common import get_node_url
 
 from ..config.settings import (
-    USE_TESTNET, MNEMONIC
+    USE_TESTNET, MNEMONIC, DAO_TENANTS, STORAGE_READS
 )
+from .metrics import track_chain_call, STORAGE_MAP_READS
+from ..db.leader import LEASE
+from ..config.loggers import LOGGER
 
+# use_testnet : client, shared by every tenant on that network
+_CLIENTS: dict[bool, CommuneClient] = {}
+_CLIENTS_LOCK = Lock()
 
-def whitelist() -> list[Ss58Address]:
-    node_url = get_node_url(use_testnet=USE_TESTNET)
-    client = CommuneClient(node_url)
-    # Get the whitelist from the blockchain
-    legit_whitelist: list[Ss58Address] = []
-    query_result = client.query_map(
-        "LegitWhitelist", 
-        params=[], 
-        extract_value=False,
-        module="GovernanceModule",
-    )
 
-    if query_result:
-        legit_whitelist = list(query_result["LegitWhitelist"].keys())
-    return legit_whitelist
+@contextmanager
+def chain_client(use_testnet: bool = USE_TESTNET) -> Iterator[CommuneClient]:
+    """
+    Pooled client for the network. It is dropped when a call on it fails, so
+    the next call reconnects instead of reusing a dead websocket.
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(use_testnet)
+        if client is None:
+            node_url = get_node_url(use_testnet=use_testnet)
+            client = CommuneClient(node_url, num_connections=DAO_TENANTS.CHAIN_CONNECTIONS)
+            _CLIENTS[use_testnet] = client
+    try:
+        yield client
+    except Exception:
+        with _CLIENTS_LOCK:
+            if _CLIENTS.get(use_testnet) is client:
+                del _CLIENTS[use_testnet]
+        raise
+
+
+# (module, storage, view, block_hash)
+EntryKey = tuple[str, str, str, str]
+# (use_testnet, module, storage, view)
+ReadKey = tuple[bool, str, str, str]
+# consumes a storage map as (key, value) pairs and keeps what a caller needs
+StorageView = Callable[[Iterator[tuple[Any, Any]]], Any]
+
+
+def iter_storage_map(
+        client: CommuneClient,
+        module: str,
+        storage: str,
+        block_hash: str,
+        page_size: int = STORAGE_READS.PAGE_SIZE,
+    ) -> Iterator[tuple[Any, Any]]:
+    """
+    Blocking; yields the (key, value) pairs of a storage map at `block_hash`
+    one page at a time, so only a page is ever held. The connection goes
+    back to the pool between pages.
+    """
+    start_key = None
+    while True:
+        with client.get_conn(init=True) as substrate:
+            page = substrate.query_map(
+                module, storage,
+                block_hash=block_hash,
+                page_size=page_size,
+                max_results=page_size,
+                start_key=start_key,
+            )
+        records = page.records
+        for key, value in records:
+            yield key.value, value.value
+        if len(records) < page_size or not page.last_key:
+            return
+        start_key = page.last_key
+
+
+class StorageCache:
+    """
+    Views of storage maps, kept per (module, storage, view, block hash).
+
+    A view is what a caller keeps while streaming the map, like its keys or
+    the pending entries, so neither the map nor the cache hold all of it. A
+    read within `ttl` seconds of the last one is served without asking the
+    node anything. After that the head block hash is fetched, and the map is
+    only read again if the head moved. Identical reads that arrive while one
+    is in flight wait for it instead of sending their own. The views handed
+    out are shared, callers must not modify them.
+    """
+
+    def __init__(self, ttl: float, max_items: int) -> None:
+        self.ttl = ttl
+        self.max_items = max_items
+        # entry key : (view, its size), least recent first
+        self._entries: OrderedDict[EntryKey, tuple[Any, int]] = OrderedDict()
+        self._items = 0
+        # read key : (monotonic read time, entry key)
+        self._latest: dict[ReadKey, tuple[float, EntryKey]] = {}
+        # keyed by generation too: a read started before a write is not joined
+        self._in_flight: dict[tuple[ReadKey, int], Future[Any]] = {}
+        self._generation = 0
+        self._lock = Lock()
+
+    def read(
+            self,
+            use_testnet: bool,
+            module: str,
+            storage: str,
+            view: str,
+            reduce: StorageView,
+    ) -> Any:
+        """`view` names what `reduce` keeps, reads of the same name share it."""
+        read_key = (use_testnet, module, storage, view)
+        with self._lock:
+            latest = self._latest.get(read_key)
+            if latest is not None and monotonic() - latest[0] < self.ttl:
+                entry = self._entries.get(latest[1])
+                if entry is not None:
+                    self._entries.move_to_end(latest[1])
+                    STORAGE_MAP_READS.inc(storage=storage, outcome="fresh")
+                    return entry[0]
+            flight_key = (read_key, self._generation)
+            future = self._in_flight.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[flight_key] = Future()
+        assert future is not None
+        if not leader:
+            STORAGE_MAP_READS.inc(storage=storage, outcome="collapsed")
+            return future.result()
+        try:
+            result = self._fetch(read_key, flight_key[1], reduce)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[flight_key]
+
+    def _fetch(self, read_key: ReadKey, generation: int, reduce: StorageView) -> Any:
+        use_testnet, module, storage, view = read_key
+        started = monotonic()
+        with chain_client(use_testnet) as client:
+            with track_chain_call("get_block_hash", "head"), client.get_conn() as substrate:
+                block_hash = substrate.get_block_hash()
+            entry_key = (module, storage, view, block_hash)
+            with self._lock:
+                entry = self._entries.get(entry_key)
+                if entry is not None:
+                    self._entries.move_to_end(entry_key)
+                    self._remember(read_key, generation, started, entry_key)
+                    STORAGE_MAP_READS.inc(storage=storage, outcome="hit")
+                    return entry[0]
+            with track_chain_call("query_map", storage):
+                result = reduce(iter_storage_map(client, module, storage, block_hash))
+        STORAGE_MAP_READS.inc(storage=storage, outcome="miss")
+        size = len(result) if isinstance(result, Sized) else 1
+        with self._lock:
+            if entry_key not in self._entries:
+                self._entries[entry_key] = (result, size)
+                self._items += size
+            self._remember(read_key, generation, started, entry_key)
+            # the newest entry stays even if it is over the bound by itself
+            while self._items > self.max_items and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._items -= evicted
+        return result
+
+    def _remember(
+            self,
+            read_key: ReadKey,
+            generation: int,
+            started: float,
+            entry_key: EntryKey,
+    ) -> None:
+        # called with the lock held; a head fetched before a write is stale
+        if generation == self._generation:
+            self._latest[read_key] = (started, entry_key)
+
+    def invalidate(self) -> None:
+        """Forces the next reads to check the head block, e.g. after a write."""
+        with self._lock:
+            self._generation += 1
+            self._latest.clear()
+
+
+STORAGE_CACHE = StorageCache(STORAGE_READS.TTL, STORAGE_READS.MAX_ITEMS)
+
+
+def whitelist(use_testnet: bool = USE_TESTNET) -> list[Ss58Address]:
+    # Get the whitelist from the blockchain; a copy, callers keep and edit
+    # it while the cached view is shared by every tenant on the network
+    return list(STORAGE_CACHE.read(
+        use_testnet, "GovernanceModule", "LegitWhitelist", "keys",
+        lambda entries: [key for key, _ in entries],
+    ))
 
 
 
@@ -33,32 +213,51 @@ async def send_call(
         keypair: 
         Keypair, 
         call: dict,
-        module: str = "GovernanceModule"
+        module: str = "GovernanceModule",
+        use_testnet: bool = USE_TESTNET,
     ):
+    # connecting and waiting for inclusion block, keep them off the event loop
+    return await asyncio.to_thread(_send_call, fn, keypair, call, module, use_testnet)
+
+
+def _send_call(fn: str, keypair: Keypair, call: dict, module: str, use_testnet: bool):
+    # a replica that lost the lease must not submit, the new leader will
+    LEASE.ensure_leader()
     # Send the call to the blockchain
-    node_url = get_node_url(use_testnet=USE_TESTNET)
-    client = CommuneClient(node_url)
-    response = client.compose_call(
-        fn=fn, 
-        params=call, 
-        key=keypair,
-        module=module
+    try:
+        with chain_client(use_testnet) as client, track_chain_call("compose_call", fn):
+            response = client.compose_call(
+                fn=fn, 
+                params=call, 
+                key=keypair,
+                module=module
+            )
+    finally:
+        # even a failed call may have been included
+        STORAGE_CACHE.invalidate()
+    LOGGER.info(
+        f"Submitted {fn}",
+        extra={"extrinsic_hash": getattr(response, "extrinsic_hash", None)},
     )
-    print(f"response of the function {fn} is {response}")
     return response
 
 
-def get_applications() -> dict[str, dict[str, str]]:
-    node_url = get_node_url(use_testnet=USE_TESTNET)
-    client = CommuneClient(node_url)
-    query_result = client.query_map(
-        "CuratorApplications", 
-        params=[], 
-        extract_value=False,
-        module="GovernanceModule"
+def _pending(entries: Iterator[tuple[Any, Any]]) -> list[dict[str, Any]]:
+    pending: list[dict[str, Any]] = []
+    for _, app in entries:
+        try:
+            if app["status"].lower() == "pending":
+                pending.append(app)
+        except Exception as e:
+            LOGGER.warning(f"Unreadable application entry: {e!r}")
+    return pending
+
+
+def get_pending_applications(use_testnet: bool = USE_TESTNET) -> list[dict[str, Any]]:
+    """Pending `CuratorApplications` entries; decided ones are dropped while streaming."""
+    return STORAGE_CACHE.read(
+        use_testnet, "GovernanceModule", "CuratorApplications", "pending", _pending
     )
-    applications = query_result.get("CuratorApplications", {})
-    return applications
 
 
 def add_dao_application():
@@ -79,18 +278,25 @@ def add_dao_application():
     )
 
 
-def refuse_dao_application(app_id: int):
-    node_url = get_node_url(use_testnet=USE_TESTNET)
-    client = CommuneClient(node_url)
-    current_keypair = Keypair.create_from_mnemonic(MNEMONIC)
+def refuse_dao_application(
+        app_id: int,
+        mnemonic: str = MNEMONIC,
+        use_testnet: bool = USE_TESTNET,
+    ):
+    LEASE.ensure_leader()
+    current_keypair = Keypair.create_from_mnemonic(mnemonic)
     fn = "refuse_dao_application"
     params = {"id": app_id}
-    query_result = client.compose_call(
-        fn, 
-        params=params, 
-        key=current_keypair,
-        module="GovernanceModule"
-    )
+    try:
+        with chain_client(use_testnet) as client, track_chain_call("compose_call", fn):
+            query_result = client.compose_call(
+                fn, 
+                params=params, 
+                key=current_keypair,
+                module="GovernanceModule"
+            )
+    finally:
+        STORAGE_CACHE.invalidate()
     return query_result
     
 
@@ -1,12 +1,13 @@
-import datetime
+import math
 
 import discord
 import html
 from communex.key import is_ss58_address
 import validators
 
-from ..db.cache import CACHE
-from ..config.settings import MODULE_SUBMISSION_DELAY, DISCORD_PARAMS
+from ..db.tenants import tenant_for
+from ..db.leader import LEASE
+from .metrics import track_command
 
 # == Module Request UI ==
 class ModuleRequestModal(discord.ui.Modal):
@@ -30,28 +31,29 @@ class ModuleRequestModal(discord.ui.Modal):
             discord.ui.InputText(label="Repository Link (GitHub, GitLab, etc.)")
         )
 
+    @track_command("module_request")
     async def callback(self, interaction: discord.Interaction):
+        if not LEASE.is_leader:
+            return
         user = interaction.user
         assert user is not None
         user_id = str(user.id)
-        current_time = datetime.datetime.now()
-        last_submission_times = CACHE.last_submission_times
-        if user_id in CACHE.last_submission_times:
-            last_submission_time = last_submission_times[user_id]
-            time_since_last_submission = current_time - last_submission_time
-
-            if time_since_last_submission < datetime.timedelta(
-                minutes=MODULE_SUBMISSION_DELAY
-            ):
-                remaining_time = (
-                    datetime.timedelta(minutes=MODULE_SUBMISSION_DELAY)
-                    - time_since_last_submission
-                )
-                await interaction.response.send_message(
-                    f"You can submit another module request in {remaining_time.seconds} seconds.",
-                    ephemeral=True,
-                )
-                return
+        tenant = tenant_for(interaction.guild)
+        if tenant is None:
+            await interaction.response.send_message(
+                "Module requests can only be submitted from a DAO server.",
+                ephemeral=True,
+            )
+            return
+        cache = tenant.cache
+        limiter = cache.rate_limits["module_request"]
+        retry_after = limiter.retry_after(user_id)
+        if retry_after:
+            await interaction.response.send_message(
+                f"You can submit another module request in {math.ceil(retry_after)} seconds.",
+                ephemeral=True,
+            )
+            return
 
         # Validate and sanitize user inputs
         ss58_address = html.escape(self.children[0].value.strip())
@@ -67,7 +69,7 @@ class ModuleRequestModal(discord.ui.Modal):
             )
             return
 
-        if ss58_address in CACHE.current_whitelist:
+        if ss58_address in cache.current_whitelist:
             await interaction.response.send_message(
                 "Module already whitelisted", ephemeral=True
             )
@@ -81,7 +83,7 @@ class ModuleRequestModal(discord.ui.Modal):
             return
 
         # Check if the SS58 address is already submitted
-        if ss58_address in CACHE.request_ids:
+        if ss58_address in cache.request_ids:
             await interaction.response.send_message(
                 "Module request already submitted", ephemeral=True
             )
@@ -100,13 +102,13 @@ class ModuleRequestModal(discord.ui.Modal):
         embed.add_field(name="Repository Link", value=repository_link, inline=False)
 
         # Key considered as the request ID
-        CACHE.request_ids.append(ss58_address)
+        cache.request_ids.append(ss58_address)
 
-        # Update the last submission time for the user
-        last_submission_times[user_id] = current_time
+        # Only accepted requests count against the limit
+        limiter.take(user_id)
 
         # Send the embed to the specific channel
-        channel_id = DISCORD_PARAMS.NOMINATOR_CHANNEL_ID
+        channel_id = tenant.config.NOMINATOR_CHANNEL_ID
         channel = interaction.guild.get_channel(channel_id)
         await channel.send(embed=embed)
 
@@ -114,7 +116,7 @@ class ModuleRequestModal(discord.ui.Modal):
         await interaction.response.send_message(
             "Module request submitted successfully", ephemeral=True
         )
-        CACHE.save_to_disk()
+        await cache.persist()
 
 
 class ModuleRequestView(discord.ui.View):
@@ -122,5 +124,7 @@ class ModuleRequestView(discord.ui.View):
     async def submit_module_request(
         self, button: discord.ui.Button, interaction: discord.Interaction
     ) -> None:
+        if not LEASE.is_leader:
+            return
         modal = ModuleRequestModal(title="Submit Module Request")
         await interaction.response.send_modal(modal)
@@ -0,0 +1,296 @@
+"""
+Stand-ins for Discord, the subspace chain and an IPFS gateway.
+
+They implement only what the bot touches, and the Discord ones subclass the
+real pycord types so the `check_type` guards in the bot accept them.
+"""
+from typing import Any
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import discord
+
+
+class FakeMember:
+    def __init__(self, member_id: int, name: str) -> None:
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{member_id}>"
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FakeMember) and other.id == self.id
+
+
+class FakeRole(discord.Role):
+    def __init__(self, role_id: int, members: list[FakeMember]) -> None:
+        self.id = role_id
+        self.name = "module_nominator"
+        self._members = members
+
+    @property
+    def members(self) -> list[FakeMember]:  # type: ignore
+        return self._members
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeTextChannel", content: str | None) -> None:
+        self.channel = channel
+        self.content = content
+
+    async def reply(self, content: str | None = None, **kwargs: Any):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, channel_id: int, rest_latency: float) -> None:
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.rest_latency = rest_latency
+        self.sent: list[str | None] = []
+        self._fake_overwrites: dict[Any, discord.PermissionOverwrite] = {}
+
+    @property
+    def overwrites(self):  # type: ignore
+        return dict(self._fake_overwrites)
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+    async def edit(self, *, overwrites=None, **kwargs: Any):  # type: ignore
+        await asyncio.sleep(self.rest_latency)
+        if overwrites is not None:
+            self._fake_overwrites = dict(overwrites)
+
+    async def send(self, content: str | None = None, **kwargs: Any):  # type: ignore
+        await asyncio.sleep(self.rest_latency)
+        self.sent.append(content)
+        return FakeMessage(self, content)
+
+
+class FakeGuild(discord.Guild):
+    def __init__(
+            self,
+            guild_id: int,
+            role: FakeRole,
+            members: list[FakeMember],
+            channels: list[FakeTextChannel],
+    ) -> None:
+        self.id = guild_id
+        self.name = "simulated-guild"
+        self._fake_role = role
+        self._fake_members = {member.id: member for member in members}
+        self._fake_channels = {channel.id: channel for channel in channels}
+
+    def get_role(self, role_id: int, /):  # type: ignore
+        return self._fake_role if role_id == self._fake_role.id else None
+
+    def get_member(self, user_id: int, /):  # type: ignore
+        return self._fake_members.get(user_id)
+
+    def get_channel(self, channel_id: int, /):  # type: ignore
+        return self._fake_channels.get(channel_id)
+
+
+class FakeContext:
+    """Mimics the parts of `discord.ApplicationContext` used by the commands."""
+
+    def __init__(
+            self,
+            author: FakeMember,
+            guild: FakeGuild,
+            channel: FakeTextChannel,
+    ) -> None:
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self.responses: list[str] = []
+
+    async def respond(self, content: str | None = None, **kwargs: Any):
+        await asyncio.sleep(self.channel.rest_latency)
+        self.responses.append(content or "")
+
+
+class LocalChain:
+    """
+    In-memory `GovernanceModule` holding curator applications and the
+    whitelist. `client` is a drop-in replacement for `CommuneClient`.
+    """
+
+    def __init__(self, latency: float = 0.0, extrinsic_latency: float | None = None) -> None:
+        # storage reads; extrinsics wait for inclusion and default to the same
+        self.latency = latency
+        self.extrinsic_latency = latency if extrinsic_latency is None else extrinsic_latency
+        self.applications: dict[int, dict[str, Any]] = {}
+        self.whitelist: dict[str, int] = {}
+        self.extrinsics: list[tuple[str, dict[str, Any]]] = []
+        # every extrinsic gets its own block
+        self.block = 0
+        self.storage_pages = 0
+        self._lock = threading.Lock()
+
+    def add_application(self, user_id: str, cid: str) -> int:
+        with self._lock:
+            app_id = len(self.applications)
+            self.applications[app_id] = {
+                "id": app_id,
+                "user_id": user_id,
+                "data": f"ipfs://{cid}",
+                "status": "Pending",
+            }
+            return app_id
+
+    def storage(self, name: str) -> dict[Any, Any]:
+        with self._lock:
+            if name == "CuratorApplications":
+                return {
+                    app_id: dict(app) for app_id, app in self.applications.items()
+                }
+            if name == "LegitWhitelist":
+                return dict(self.whitelist)
+            return {}
+
+    def client(self, url: str, *args: Any, **kwargs: Any) -> "LocalChainClient":
+        return LocalChainClient(self)
+
+
+class LocalChainClient:
+    def __init__(self, chain: LocalChain) -> None:
+        self._chain = chain
+
+    @contextlib.contextmanager
+    def get_conn(self, timeout: float | None = None, init: bool = False):
+        yield LocalSubstrate(self._chain)
+
+
+    def compose_call(
+            self,
+            fn: str,
+            params: dict[str, Any],
+            key: Any,
+            module: str = "SubspaceModule",
+            **kwargs: Any,
+    ) -> str:
+        time.sleep(self._chain.extrinsic_latency)
+        chain = self._chain
+        with chain._lock:
+            chain.extrinsics.append((fn, params))
+            chain.block += 1
+            if fn == "add_to_whitelist":
+                chain.whitelist[params["module_key"]] = params["recommended_weight"]
+                for app in chain.applications.values():
+                    if app["user_id"] == params["module_key"]:
+                        app["status"] = "Accepted"
+            elif fn == "remove_from_whitelist":
+                chain.whitelist.pop(params["module_key"], None)
+            elif fn == "refuse_dao_application":
+                chain.applications[params["id"]]["status"] = "Refused"
+        return f"<ExtrinsicReceipt {fn} #{len(chain.extrinsics)}>"
+
+
+class _Scale:
+    # stands in for the decoded SCALE objects `query_map` records hold
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+
+class LocalPage:
+    def __init__(self, records: list[tuple[_Scale, _Scale]], last_key: str | None) -> None:
+        self.records = records
+        self.last_key = last_key
+
+
+class LocalSubstrate:
+    """The `SubstrateInterface` calls made on pooled connections."""
+
+    def __init__(self, chain: LocalChain) -> None:
+        self._chain = chain
+
+    def get_block_hash(self, block_id: int | None = None) -> str:
+        time.sleep(self._chain.latency / 4)
+        with self._chain._lock:
+            return f"0x{self._chain.block:064x}"
+
+    def query_map(
+            self,
+            module: str,
+            storage_function: str,
+            params: list[Any] | None = None,
+            block_hash: str | None = None,
+            max_results: int | None = None,
+            start_key: str | None = None,
+            page_size: int = 100,
+            **kwargs: Any,
+    ) -> LocalPage:
+        # one page per call, whatever the block: it is only asked for the head
+        time.sleep(self._chain.latency)
+        storage = self._chain.storage(storage_function)
+        with self._chain._lock:
+            self._chain.storage_pages += 1
+        keys = sorted(storage, key=str)
+        if start_key is not None:
+            keys = [key for key in keys if str(key) > start_key]
+        page = keys[:min(page_size, max_results or page_size)]
+        records = [(_Scale(key), _Scale(storage[key])) for key in page]
+        return LocalPage(records, str(page[-1]) if page else None)
+
+class IpfsGatewayStub:
+    """Serves `/ipfs/<cid>` from a dict on a local HTTP port."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.documents: dict[str, dict[str, Any]] = {}
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.latency)
+                cid = self.path.rsplit("/", 1)[-1]
+                document = stub.documents.get(cid)
+                if document is None:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(document).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/ipfs/"
+
+    def add(self, cid: str, document: dict[str, Any]) -> None:
+        self.documents[cid] = document
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
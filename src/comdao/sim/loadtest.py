@@ -0,0 +1,419 @@
+"""
+Load simulation of the bot.
+
+Drives `approve`/`reject`/`remove` and `show_pending_applications`
+concurrently against fake Discord objects, a `LocalChain` standing in for
+`CommuneClient` and a local IPFS gateway, then reports command latency
+percentiles, cache lock wait/hold time and event-loop stall time.
+
+    python -m comdao.sim.loadtest --applications 300 --nominators 40
+
+`--fixture` replaces the generated applications, whitelist and proposals
+with traffic recorded by `comdao.sim.replay`, `--record` writes the traffic
+of this run to a fixture.
+"""
+from typing import Any, Awaitable, Callable
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+from collections import Counter, defaultdict
+from time import perf_counter
+
+from tabulate import tabulate
+
+from .fakes import (
+    FakeContext,
+    FakeGuild,
+    FakeMember,
+    FakeRole,
+    FakeTextChannel,
+    IpfsGatewayStub,
+    LocalChain,
+)
+from .replay import TrafficRecorder, load_fixture, replay_backend
+
+GUILD_ID = 1
+REQUEST_CHANNEL_ID = 2
+NOMINATOR_CHANNEL_ID = 3
+ROLE_ID = 4
+
+
+def _bootstrap_environment(workdir: str) -> None:
+    # settings are read at import time, so this must run before importing
+    # anything from comdao outside of this package
+    from substrateinterface import Keypair
+
+    os.chdir(workdir)
+    os.environ["DISCORD_BOT_TOKEN"] = "simulated"
+    os.environ["DISCORD_GUILD_ID"] = str(GUILD_ID)
+    os.environ["DISCORD_REQUEST_CHANNEL_ID"] = str(REQUEST_CHANNEL_ID)
+    os.environ["DISCORD_NOMINATOR_CHANNEL_ID"] = str(NOMINATOR_CHANNEL_ID)
+    os.environ["DISCORD_ROLE_ID"] = str(ROLE_ID)
+    os.environ["SUBSPACE_MNEMONIC"] = Keypair.generate_mnemonic()
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LockRecorder:
+    """`CacheLocks` observer collecting wait and hold times per lock scope."""
+
+    def __init__(self) -> None:
+        self.waits: dict[str, list[float]] = defaultdict(list)
+        self.holds: dict[str, list[float]] = defaultdict(list)
+
+    def __call__(self, scope: str, waited: float, held: float) -> None:
+        self.waits[scope].append(waited)
+        self.holds[scope].append(held)
+
+
+class LoopMonitor:
+    """Measures how late the event loop wakes up a periodic sleeper."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.stalls: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = perf_counter()
+            await asyncio.sleep(self.interval)
+            self.stalls.append(max(0.0, perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        assert self._task
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.error_kinds: Counter[str] = Counter()
+
+    async def timed(self, name: str, coro: Awaitable[Any]) -> None:
+        start = perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            self.errors[name] += 1
+            self.error_kinds[f"{name}: {type(e).__name__}"] += 1
+        finally:
+            self.latencies[name].append(perf_counter() - start)
+
+
+def _proposal_body(index: int, rng: random.Random) -> str:
+    paragraphs = [
+        f"## Module {index}",
+        "This module serves inference for the commune network.",
+        f"Endpoint: http://module-{index}.example:8000/docs",
+        f"Team: dev-{rng.randint(1, 500)}, dev-{rng.randint(1, 500)}",
+        f"Repository: https://github.com/example/module-{index}",
+    ]
+    return "\n".join(paragraphs) + "\n" + "lorem ipsum " * rng.randint(10, 200)
+
+
+async def _wait_for(predicate: Callable[[], bool], timeout: float) -> bool:
+    deadline = perf_counter() + timeout
+    while not predicate():
+        if perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def simulate(args: argparse.Namespace) -> dict[str, Any]:
+    from substrateinterface import Keypair
+
+    from ..bot import approve, reject, remove, show_pending_applications
+    from ..config.settings import BOT
+    from ..db.tenants import TENANTS
+    from ..helpers import ipfs, substrate_interface
+
+    rng = random.Random(args.seed)
+    extrinsic_latency = (
+        args.chain_latency if args.extrinsic_latency is None else args.extrinsic_latency
+    )
+    if args.fixture:
+        fixture = load_fixture(args.fixture)
+        chain, gateway = replay_backend(
+            fixture,
+            None if args.recorded_latency else args.chain_latency,
+            None if args.recorded_latency else args.ipfs_latency,
+            None if args.recorded_latency else extrinsic_latency,
+        )
+        gateways = [gateway]
+        applicant_ids = sorted({
+            int(document["discord_id"]) for document in fixture["documents"].values()
+            if document and str(document.get("discord_id", "")).isdigit()
+        })
+    else:
+        chain = LocalChain(args.chain_latency, extrinsic_latency)
+        # gateway i answers i times slower than the first one
+        gateways = [
+            IpfsGatewayStub(latency=args.ipfs_latency * (i + 1)) for i in range(args.gateways)
+        ]
+        applicant_ids = [100_000 + i for i in range(args.applications)]
+    for gateway in gateways:
+        gateway.start()
+
+    nominators = [FakeMember(1000 + i, f"nominator-{i}") for i in range(args.nominators)]
+    applicants = [FakeMember(member_id, f"applicant-{member_id}") for member_id in applicant_ids]
+    role = FakeRole(ROLE_ID, nominators)
+    request_channel = FakeTextChannel(REQUEST_CHANNEL_ID, args.rest_latency)
+    nominator_channel = FakeTextChannel(NOMINATOR_CHANNEL_ID, args.rest_latency)
+    guild = FakeGuild(
+        GUILD_ID, role, nominators + applicants, [request_channel, nominator_channel]
+    )
+
+    for i, applicant in enumerate(applicants if not args.fixture else []):
+        key = Keypair.create_from_uri(f"//simulated-module-{i}").ss58_address
+        cid = f"QmSimulated{i:08d}"
+        document = {
+            "discord_id": str(applicant.id),
+            "title": f"Module {i}",
+            "body": _proposal_body(i, rng),
+        }
+        for gateway in gateways:
+            gateway.add(cid, document)
+        chain.add_application(key, cid)
+    for i in range(args.whitelisted if not args.fixture else 0):
+        key = Keypair.create_from_uri(f"//simulated-whitelisted-{i}").ss58_address
+        chain.whitelist[key] = rng.randint(1, 100)
+
+    async def fetch_channel(channel_id: int):
+        await asyncio.sleep(args.rest_latency)
+        return guild.get_channel(channel_id)
+
+    substrate_interface.CommuneClient = chain.client  # type: ignore
+    substrate_interface._CLIENTS.clear()
+    ipfs.RETRIEVER = ipfs.ProposalRetriever(
+        "", [gateway.url for gateway in gateways], race_width=args.gateways
+    )
+    traffic = None
+    if args.record:
+        traffic = TrafficRecorder()
+        traffic.install()
+    BOT.fetch_channel = fetch_channel  # type: ignore
+    BOT.get_guild = lambda guild_id: guild  # type: ignore
+    cache_locks = LockRecorder()
+    # the environment above configures a single tenant
+    tenant = next(iter(TENANTS.values()))
+    cache = tenant.cache
+    cache.locks.observer = cache_locks
+    cache.current_whitelist = substrate_interface.whitelist(tenant.config.USE_TESTNET)
+
+    recorder = Recorder()
+    monitor = LoopMonitor()
+    monitor.start()
+    running = True
+
+    async def ticker() -> None:
+        while running:
+            await recorder.timed(
+                "show_pending_applications", show_pending_applications.coro()
+            )
+            await asyncio.sleep(args.tick_interval)
+
+    async def fire(name: str, member: FakeMember, *command_args: Any) -> None:
+        await asyncio.sleep(rng.uniform(0, args.vote_spread))
+        ctx = FakeContext(member, guild, nominator_channel)
+        command = {"approve": approve, "reject": reject, "remove": remove}[name]
+        await recorder.timed(name, command.callback(ctx, *command_args))
+
+    ticker_task = asyncio.create_task(ticker())
+    decided = 0
+    stalled = False
+    first_shown: float | None = None
+    # time from the last vote of a round to the next application in the slot
+    refills: list[float] = []
+    started = perf_counter()
+    for _ in range(args.rounds):
+        if not await _wait_for(lambda: cache.app_being_voted is not None, args.round_timeout):
+            stalled = True
+            break
+        if first_shown is None:
+            first_shown = perf_counter() - started
+        assert cache.app_being_voted is not None
+        app_id = cache.app_being_voted[0].app_id
+        voters = list(nominators)
+        rng.shuffle(voters)
+        votes: list[Awaitable[None]] = []
+        if rng.random() < args.approve_ratio:
+            for member in voters:
+                votes.append(fire("approve", member, app_id, rng.randint(1, 100)))
+        else:
+            for member in voters:
+                votes.append(fire("reject", member, app_id, "simulated rejection"))
+        if cache.current_whitelist:
+            target = rng.choice(cache.current_whitelist)
+            for member in voters[:args.removals_per_round]:
+                votes.append(fire("remove", member, target, "simulated removal"))
+        await asyncio.gather(*votes)
+        voted_at = perf_counter()
+
+        def slot_moved_on() -> bool:
+            voted = cache.app_being_voted
+            return voted is None or voted[0].app_id != app_id
+
+        if not await _wait_for(slot_moved_on, args.round_timeout):
+            stalled = True
+            break
+        decided += 1
+
+        def slot_refilled() -> bool:
+            voted = cache.app_being_voted
+            return voted is not None and voted[0].app_id != app_id
+
+        if cache.render_applications_queue or cache.backfilling:
+            if await _wait_for(slot_refilled, args.round_timeout):
+                refills.append(perf_counter() - voted_at)
+    elapsed = perf_counter() - started
+
+    running = False
+    await ticker_task
+    if tenant.backfill_task is not None:
+        tenant.backfill_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await tenant.backfill_task
+    await monitor.stop()
+    for gateway in gateways:
+        gateway.stop()
+    if traffic is not None:
+        traffic.save(args.record)
+    return {
+        "recorder": recorder,
+        "locks": cache_locks,
+        "monitor": monitor,
+        "decided": decided,
+        "stalled": stalled,
+        "elapsed": elapsed,
+        "first_shown": first_shown,
+        "refills": sorted(refills),
+        "extrinsics": len(chain.extrinsics),
+        "storage_pages": chain.storage_pages,
+        "ipfs_hits": sum(gateway.hits for gateway in gateways),
+        "request_messages": len(request_channel.sent),
+        "role_pings": sum(
+            role.mention in (content or "") for content in request_channel.sent
+        ),
+    }
+
+
+def report(result: dict[str, Any]) -> str:
+    recorder: Recorder = result["recorder"]
+    locks: LockRecorder = result["locks"]
+    monitor: LoopMonitor = result["monitor"]
+    ms = 1000
+
+    command_rows = []
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        command_rows.append((
+            name, len(values), recorder.errors[name],
+            percentile(values, 0.5) * ms, percentile(values, 0.9) * ms,
+            percentile(values, 0.99) * ms, values[-1] * ms,
+        ))
+    measures: list[tuple[str, list[float]]] = []
+    for scope in sorted(locks.waits):
+        measures.append((f"{scope} lock wait", sorted(locks.waits[scope])))
+        measures.append((f"{scope} lock hold", sorted(locks.holds[scope])))
+    measures.append(("event loop stall", sorted(monitor.stalls)))
+    contention_rows = [
+        (name, len(values), sum(values) * ms,
+         percentile(values, 0.99) * ms, (values or [0])[-1] * ms)
+        for name, values in measures
+    ]
+    lines = [
+        tabulate(
+            command_rows,
+            ["Command", "Calls", "Errors", "p50 ms", "p90 ms", "p99 ms", "max ms"],
+            tablefmt="grid", floatfmt=".1f",
+        ),
+        tabulate(
+            contention_rows,
+            ["Measure", "Samples", "total ms", "p99 ms", "max ms"],
+            tablefmt="grid", floatfmt=".1f",
+        ),
+        f"Decided applications: {result['decided']} in {result['elapsed']:.1f}s"
+        + (" (voting stalled)" if result["stalled"] else ""),
+        f"First application shown after: {result['first_shown'] or 0:.2f}s",
+        f"Next application in the slot after the last vote: p50 {percentile(result['refills'], 0.5) * ms:.1f} ms,"
+        f" max {(result['refills'] or [0])[-1] * ms:.1f} ms",
+        f"Extrinsics submitted: {result['extrinsics']}",
+        f"Storage map pages read: {result['storage_pages']}",
+        f"IPFS gateway requests: {result['ipfs_hits']}",
+        f"Request channel messages: {result['request_messages']}"
+        f" ({result['role_pings']} role pings)",
+    ]
+    if recorder.error_kinds:
+        lines.append("Errors:")
+        lines.extend(
+            f"  {kind} x{count}" for kind, count in recorder.error_kinds.most_common()
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--applications", type=int, default=300)
+    parser.add_argument("--nominators", type=int, default=40)
+    parser.add_argument("--whitelisted", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--approve-ratio", type=float, default=0.7)
+    parser.add_argument("--removals-per-round", type=int, default=5)
+    parser.add_argument("--chain-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--extrinsic-latency", type=float, default=None,
+        help="seconds an extrinsic takes, --chain-latency by default",
+    )
+    parser.add_argument("--ipfs-latency", type=float, default=0.02)
+    parser.add_argument("--gateways", type=int, default=1)
+    parser.add_argument("--rest-latency", type=float, default=0.05)
+    parser.add_argument("--tick-interval", type=float, default=0.5)
+    parser.add_argument("--vote-spread", type=float, default=1.0)
+    parser.add_argument("--round-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--fixture", default="", help="replay the state recorded in this fixture file"
+    )
+    parser.add_argument(
+        "--recorded-latency", action="store_true",
+        help="with --fixture, use the recorded chain and IPFS latencies",
+    )
+    parser.add_argument(
+        "--record", default="", help="write the chain and IPFS traffic to this fixture file"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the bot's own output"
+    )
+    args = parser.parse_args()
+    # the simulation runs in a temporary directory
+    args.fixture = args.fixture and os.path.abspath(args.fixture)
+    args.record = args.record and os.path.abspath(args.record)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _bootstrap_environment(workdir)
+        bot_output = contextlib.nullcontext() if args.verbose else \
+            contextlib.redirect_stdout(io.StringIO())
+        with bot_output:
+            result = asyncio.run(simulate(args))
+    print(report(result))
+
+
+if __name__ == "__main__":
+    main()
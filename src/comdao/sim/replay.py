@@ -0,0 +1,246 @@
+"""
+Record chain and IPFS traffic once, replay it offline.
+
+`TrafficRecorder` wraps the `CommuneClient` factory of `substrate_interface`
+and `ipfs.RETRIEVER` to capture the first complete read of every storage
+map, the extrinsics submitted and the proposals fetched, with how long each
+took. The fixture is a gzipped JSON file:
+
+    {"storage": {"GovernanceModule.CuratorApplications": [[key, value], ...]},
+     "documents": {cid: document or null},
+     "calls": [[fn, params, seconds], ...],
+     "latency": {"query_map": seconds, "compose_call": ..., "ipfs": ...}}
+
+`replay_backend` seeds a `LocalChain` and an `IpfsGatewayStub` with a
+fixture, so `loadtest --fixture` reruns the recorded state at fixed or
+recorded latencies. Extrinsics are applied by `LocalChain`, not replayed.
+
+    python -m comdao.sim.replay record fixture.json.gz
+    python -m comdao.sim.loadtest --fixture fixture.json.gz --recorded-latency
+"""
+from typing import Any
+from collections import defaultdict
+from statistics import median
+from time import perf_counter
+import argparse
+import contextlib
+import gzip
+import json
+import threading
+
+from .fakes import IpfsGatewayStub, LocalChain
+
+CURATOR_APPLICATIONS = "GovernanceModule.CuratorApplications"
+LEGIT_WHITELIST = "GovernanceModule.LegitWhitelist"
+
+
+class TrafficRecorder:
+    def __init__(self) -> None:
+        self.storage: dict[str, list[list[Any]]] = {}
+        self.documents: dict[str, Any] = {}
+        self.calls: list[list[Any]] = []
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        # (storage, thread) : entries of a read still being paged
+        self._partial: dict[tuple[str, int], list[list[Any]]] = {}
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        """Wraps the chain client factory and the proposal retriever."""
+        from ..helpers import ipfs, substrate_interface
+
+        client_factory = substrate_interface.CommuneClient
+        substrate_interface.CommuneClient = (  # type: ignore
+            lambda *args, **kwargs: RecordingClient(self, client_factory(*args, **kwargs))
+        )
+        substrate_interface._CLIENTS.clear()
+        get_proposal = ipfs.RETRIEVER.get_proposal
+
+        def recorded_get_proposal(cid: str):
+            start = perf_counter()
+            document = get_proposal(cid)
+            self.document(cid, document, perf_counter() - start)
+            return document
+
+        ipfs.RETRIEVER.get_proposal = recorded_get_proposal  # type: ignore
+
+    def timed(self, operation: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[operation].append(seconds)
+
+    def page(
+            self,
+            storage: str,
+            first: bool,
+            entries: list[list[Any]],
+            last: bool,
+        ) -> None:
+        key = (storage, threading.get_ident())
+        with self._lock:
+            if first:
+                self._partial[key] = []
+            partial = self._partial.get(key)
+            if partial is None:
+                return
+            partial.extend(entries)
+            if last:
+                del self._partial[key]
+                self.storage.setdefault(storage, partial)
+
+    def document(self, cid: str, document: Any, seconds: float) -> None:
+        with self._lock:
+            if cid not in self.documents:
+                self.documents[cid] = document
+                self.timings["ipfs"].append(seconds)
+
+    def call(self, fn: str, params: dict[str, Any], seconds: float) -> None:
+        with self._lock:
+            self.calls.append([fn, params, round(seconds, 4)])
+            self.timings["compose_call"].append(seconds)
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            fixture = {
+                "storage": self.storage,
+                "documents": self.documents,
+                "calls": self.calls,
+                "latency": {
+                    operation: round(median(values), 4)
+                    for operation, values in self.timings.items() if values
+                },
+            }
+            payload = json.dumps(fixture, separators=(",", ":"), default=str)
+        with gzip.open(path, "wt") as file:
+            file.write(payload)
+
+
+class RecordingClient:
+    def __init__(self, recorder: TrafficRecorder, client: Any) -> None:
+        self._recorder = recorder
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    @contextlib.contextmanager
+    def get_conn(self, *args: Any, **kwargs: Any):
+        with self._client.get_conn(*args, **kwargs) as substrate:
+            yield RecordingSubstrate(self._recorder, substrate)
+
+    def compose_call(
+            self,
+            fn: str,
+            params: dict[str, Any],
+            key: Any,
+            module: str = "SubspaceModule",
+            **kwargs: Any,
+    ) -> Any:
+        start = perf_counter()
+        receipt = self._client.compose_call(
+            fn=fn, params=params, key=key, module=module, **kwargs
+        )
+        self._recorder.call(fn, params, perf_counter() - start)
+        return receipt
+
+
+class RecordingSubstrate:
+    def __init__(self, recorder: TrafficRecorder, substrate: Any) -> None:
+        self._recorder = recorder
+        self._substrate = substrate
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._substrate, name)
+
+    def get_block_hash(self, *args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        block_hash = self._substrate.get_block_hash(*args, **kwargs)
+        self._recorder.timed("get_block_hash", perf_counter() - start)
+        return block_hash
+
+    def query_map(self, module: str, storage_function: str, *args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        page = self._substrate.query_map(module, storage_function, *args, **kwargs)
+        self._recorder.timed("query_map", perf_counter() - start)
+        page_size = kwargs.get("max_results") or kwargs.get("page_size", 100)
+        self._recorder.page(
+            f"{module}.{storage_function}",
+            kwargs.get("start_key") is None,
+            [[key.value, value.value] for key, value in page.records],
+            # same end of map test as `iter_storage_map`
+            len(page.records) < page_size or not page.last_key,
+        )
+        return page
+
+
+def load_fixture(path: str) -> dict[str, Any]:
+    with gzip.open(path, "rt") as file:
+        return json.load(file)
+
+
+def replay_backend(
+        fixture: dict[str, Any],
+        chain_latency: float | None = None,
+        ipfs_latency: float | None = None,
+        extrinsic_latency: float | None = None,
+    ) -> tuple[LocalChain, IpfsGatewayStub]:
+    """
+    A chain and a gateway serving the fixture; latencies default to the
+    recorded medians. The gateway still has to be started.
+    """
+    recorded = fixture.get("latency", {})
+    if chain_latency is None:
+        chain_latency = recorded.get("query_map", 0.0)
+    if ipfs_latency is None:
+        ipfs_latency = recorded.get("ipfs", 0.0)
+    if extrinsic_latency is None:
+        # fixtures without submitted extrinsics have no median of their own
+        extrinsic_latency = recorded.get("compose_call", chain_latency)
+    chain = LocalChain(latency=chain_latency, extrinsic_latency=extrinsic_latency)
+    storage = fixture["storage"]
+    for app_id, app in storage.get(CURATOR_APPLICATIONS, []):
+        chain.applications[int(app_id)] = app
+    for key, weight in storage.get(LEGIT_WHITELIST, []):
+        chain.whitelist[key] = weight
+    gateway = IpfsGatewayStub(latency=ipfs_latency)
+    for cid, document in fixture["documents"].items():
+        # proposals that could not be fetched stay missing
+        if document is not None:
+            gateway.add(cid, document)
+    return chain, gateway
+
+
+def record(path: str, limit: int) -> None:
+    """
+    Captures what a first tick of the default tenant reads: the whitelist,
+    the pending applications and up to `limit` of their proposals.
+    """
+    recorder = TrafficRecorder()
+    recorder.install()
+    from ..db.tenants import TENANTS
+    from ..helpers.domain_logic import resolve_applications
+    from ..helpers.substrate_interface import get_pending_applications, whitelist
+
+    tenant = next(iter(TENANTS.values()))
+    use_testnet = tenant.config.USE_TESTNET
+    whitelist(use_testnet)
+    pending = get_pending_applications(use_testnet)
+    resolve_applications(sorted(pending, key=lambda app: app["id"])[:limit])
+    recorder.save(path)
+    print(
+        f"Recorded {len(pending)} pending applications, "
+        f"{len(recorder.documents)} proposals to {path}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="capture a fixture from the live network")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--limit", type=int, default=1000, help="proposals to fetch")
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.path, args.limit)
+
+
+if __name__ == "__main__":
+    main()
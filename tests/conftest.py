@@ -0,0 +1,11 @@
+import os
+
+# settings are read at import time, so this must run before anything from
+# comdao that reads them is imported
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test")
+os.environ.setdefault("DISCORD_GUILD_ID", "1")
+os.environ.setdefault("DISCORD_REQUEST_CHANNEL_ID", "2")
+os.environ.setdefault("DISCORD_NOMINATOR_CHANNEL_ID", "3")
+os.environ.setdefault("DISCORD_ROLE_ID", "4")
+os.environ.setdefault("SUBSPACE_MNEMONIC", "test")
+os.environ.setdefault("MONITORING_METRICS_PORT", "0")
@@ -0,0 +1,73 @@
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import asyncio
+import json
+
+import pytest
+
+from comdao.db.cache import Cache
+from comdao.db.tenants import TENANTS
+from comdao.helpers.api import start_api_server
+
+
+def save(cache: Cache) -> None:
+    cache._write(*cache._snapshot())
+
+
+def test_version_moves_only_when_the_state_changes(tmp_path):
+    cache = Cache(str(tmp_path / "state.json"))
+    loaded = cache.version
+    save(cache)
+    saved = cache.version
+    assert saved == loaded + 1
+    save(cache)
+    assert cache.version == saved
+    cache.add_rejection_vote("1", 7)
+    save(cache)
+    assert cache.version == saved + 1
+    # the whitelist isn't saved, but it is part of the version
+    cache.current_whitelist = ["key"]
+    save(cache)
+    assert cache.version == saved + 2
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    tenant = next(iter(TENANTS.values()))
+    monkeypatch.setattr(tenant, "cache", Cache(str(tmp_path / "state.json")))
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, daemon=True).start()
+    server = start_api_server("127.0.0.1", 0, loop)
+    host, port = server.server_address[:2]
+    yield tenant, f"http://{host}:{port}/api/{tenant.name}"
+    server.shutdown()
+    server.server_close()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def get(url: str, etag: str | None = None):
+    request = Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urlopen(request) as response:
+            return response.status, response.headers["ETag"], json.load(response)
+    except HTTPError as e:
+        return e.code, e.headers["ETag"], None
+
+
+def test_conditional_requests(api):
+    tenant, url = api
+    status, etag, body = get(f"{url}/tallies")
+    assert status == 200 and body["application"] is None
+    assert get(f"{url}/tallies", etag)[:2] == (304, etag)
+    tenant.cache.add_rejection_vote("1", 7)
+    save(tenant.cache)
+    status, new_etag, body = get(f"{url}/participation", etag)
+    assert status == 200 and new_etag != etag
+    assert body["participation"] == {"1": {"approvals": 0, "rejections": 1, "removals": 0}}
+
+
+def test_unknown_views(api):
+    _, url = api
+    assert get(f"{url}/nothing")[0] == 404
+    assert get(url.replace("/api/", "/api/missing-"))[0] == 404
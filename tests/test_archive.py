@@ -0,0 +1,69 @@
+import asyncio
+import os
+
+from comdao.config.application import Application
+from comdao.db.archive import Archive
+from comdao.db.cache import Cache
+
+KEY = "5GrwvaEF5zXb26Fz9rcQpDWS57CtERHpNehXCPcNoHGKutQY"
+
+
+def decision(subject, decided_at: float, **extra) -> dict:
+    return {"kind": "application", "subject": subject, "outcome": "refused",
+            "decided_at": decided_at, **extra}
+
+
+def test_segments_roll_over_the_size(tmp_path):
+    archive = Archive(str(tmp_path), segment_bytes=1)
+    archive.append([decision(1, 1.0)])
+    archive.append([decision(2, 2.0)])
+    assert len(archive.segments()) == 2
+    big = Archive(str(tmp_path / "big"))
+    big.append([decision(1, 1.0)])
+    big.append([decision(2, 2.0)])
+    assert len(big.segments()) == 1
+    # a new process never appends to a segment an earlier one wrote
+    Archive(str(tmp_path / "big")).append([decision(3, 3.0)])
+    assert len(big.segments()) == 2
+
+
+def test_lookup_newest_first_without_duplicates(tmp_path):
+    archive = Archive(str(tmp_path))
+    archive.append([decision(1, 1.0, app_key=KEY), decision(2, 2.0)])
+    # archived again by a crash before the state file was saved
+    archive.append([decision(1, 1.0, app_key=KEY), decision(1, 5.0)])
+    assert [record["decided_at"] for record in archive.lookup(1)] == [5.0, 1.0]
+    assert [record["subject"] for record in archive.lookup(KEY)] == [1]
+    assert archive.lookup(3) == []
+
+
+def test_segment_cut_short_keeps_its_whole_records(tmp_path):
+    archive = Archive(str(tmp_path))
+    archive.append([decision(1, 1.0)])
+    segment = archive.segments()[0]
+    first_member = os.path.getsize(segment)
+    archive.append([decision(2, 2.0)])
+    # a crash in the middle of writing the second member
+    with open(segment, "r+b") as file:
+        file.truncate(first_member + 12)
+    assert [record["subject"] for record in archive.records()] == [1]
+
+
+def test_compact_moves_old_decisions_to_the_archive(tmp_path):
+    cache = Cache(str(tmp_path / "state.json"))
+    app = Application.from_trusted({
+        "discord_id": "1", "app_id": 7, "title": "t", "body": "b", "app_key": KEY,
+    })
+    cache.dao_applications.append(7)
+    cache.request_ids.append(KEY)
+    cache.add_rejection_vote("1", 7)
+    cache.record_application_decision(app, "refused")
+    cache.decided[0]["decided_at"] -= 100
+
+    assert asyncio.run(cache.compact(retention=10)) == 1
+    assert cache.decided == []
+    assert cache.dao_applications == [] and cache.request_ids == []
+    assert cache.rejection_approvals == {} and cache.rejection_counts == {}
+    found = asyncio.run(cache.find_decisions(KEY))
+    assert [record["subject"] for record in found] == [7]
+    assert asyncio.run(cache.compact(retention=10)) == 0
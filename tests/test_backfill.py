@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from substrateinterface import Keypair
+
+from comdao.config.tenants import TenantConfig
+from comdao.db.tenants import Tenant
+from comdao.helpers import domain_logic, ipfs, substrate_interface
+from comdao.helpers.domain_logic import (
+    _enqueue, backfill_applications, list_new_pending_applications, resolve_applications,
+)
+from comdao.sim.fakes import IpfsGatewayStub, LocalChain
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = LocalChain()
+    gateway = IpfsGatewayStub()
+    gateway.start()
+    for i in range(5):
+        add_application(chain, gateway, i)
+    monkeypatch.setitem(substrate_interface._CLIENTS, False, chain.client(""))
+    monkeypatch.setattr(
+        substrate_interface, "STORAGE_CACHE", substrate_interface.StorageCache(0, 1000)
+    )
+    monkeypatch.setattr(ipfs, "RETRIEVER", ipfs.ProposalRetriever("", [gateway.url]))
+    monkeypatch.setattr(domain_logic.IPFS, "BACKFILL_CHUNK", 2)
+    yield chain, gateway
+    gateway.stop()
+
+
+def add_application(chain: LocalChain, gateway: IpfsGatewayStub, i: int) -> int:
+    gateway.add(f"cid-{i}", {"discord_id": str(100 + i), "title": f"app {i}", "body": "b"})
+    key = Keypair.create_from_uri(f"//module-{i}").ss58_address
+    app_id = chain.add_application(key, f"cid-{i}")
+    # submitted in a block of its own
+    chain.block += 1
+    return app_id
+
+
+def tenant(tmp_path) -> Tenant:
+    return Tenant(TenantConfig(
+        NAME="test", GUILD_ID=1, REQUEST_CHANNEL_ID=2, NOMINATOR_CHANNEL_ID=3, ROLE_ID=4,
+        MNEMONIC="words", STATE_FILE=str(tmp_path / "state.json"),
+    ))
+
+
+def queued_ids(tenant: Tenant) -> list[int]:
+    return [app.app_id for app, _ in tenant.cache.render_applications_queue]
+
+
+def test_interrupted_backfill_resumes_from_its_last_chunk(tmp_path, chain):
+    local_chain, gateway = chain
+    first = tenant(tmp_path)
+    assert first.cache.backfilling
+
+    async def crash_after_the_first_chunk():
+        # meanwhile the tick ingested an application newer than the backfill
+        app_id = add_application(local_chain, gateway, 5)
+        entries = list_new_pending_applications(set(first.cache.dao_applications), False)
+        new = [entry for entry in entries if entry["id"] == app_id]
+        _enqueue(first.cache, resolve_applications(new))
+        await first.cache.persist()
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        asyncio.run(backfill_applications(first, crash_after_the_first_chunk))
+    assert queued_ids(first) == [0, 1, 5]
+
+    # a restart reads the saved chunk back and fetches only the rest
+    second = tenant(tmp_path)
+    assert second.cache.backfilling and second.cache.backfill_until == 4
+    hits = gateway.hits
+    asyncio.run(backfill_applications(second))
+    assert gateway.hits - hits == 3
+    assert queued_ids(second) == [0, 1, 2, 3, 4, 5]
+    assert not second.cache.backfilling and second.cache.backfill_until is None
+    assert [second.cache.queue_position(app_id) for app_id in (0, 5)] == [1, 6]
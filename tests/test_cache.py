@@ -0,0 +1,105 @@
+from statistics import median
+import json
+import random
+
+from comdao.config.application import Application
+from comdao.db import cache as cache_module
+from comdao.db.cache import Cache, WeightHistogram
+from comdao.db.leader import LeaderLease
+
+KEY = "5GrwvaEF5zXb26Fz9rcQpDWS57CtERHpNehXCPcNoHGKutQY"
+OTHER_KEY = "5FHneW46xGXgs5mUiveU4sbTyGBzmstUspZC92UhjJM694ty"
+
+
+def save(cache: Cache) -> None:
+    cache._write(*cache._snapshot())
+
+
+def test_deposed_replica_does_not_overwrite_the_state(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.json")
+    cache = Cache(path)
+    cache.applicator_discord_id = "1"
+    save(cache)
+    # the lease file exists, but this replica never held the lease
+    monkeypatch.setattr(cache_module, "LEASE", LeaderLease(str(tmp_path / "lease.db"), "old"))
+    cache.applicator_discord_id = "2"
+    save(cache)
+    with open(path) as file:
+        assert json.loads(json.load(file)["applicator_discord_id"]) == "1"
+
+
+def test_histogram_median_matches_statistics():
+    rng = random.Random(0)
+    for size in range(1, 40):
+        weights = [rng.randint(-5, 120) for _ in range(size)]
+        histogram = WeightHistogram()
+        for user_id, weight in enumerate(weights):
+            histogram.add(str(user_id), weight)
+        # weights are clamped to 1..100 like the votes are
+        assert histogram.median() == median(min(max(w, 1), 100) for w in weights)
+    assert WeightHistogram().median() is None
+
+
+def test_drop_nomination_votes_forgets_only_that_module(tmp_path):
+    cache = Cache(str(tmp_path / "state.json"))
+    assert cache.add_nomination_vote("1", KEY, 10) == 1
+    assert cache.add_nomination_vote("2", KEY, 30) == 2
+    cache.add_nomination_vote("2", OTHER_KEY, 50)
+    assert cache.median_weight(KEY) == 20
+    cache.drop_nomination_votes(KEY)
+    assert cache.median_weight(KEY) is None
+    assert cache.nomination_approvals == {"1": [], "2": [OTHER_KEY]}
+    assert cache.add_nomination_vote("1", KEY, 70) == 1
+
+
+def test_histograms_are_rebuilt_on_load(tmp_path):
+    path = str(tmp_path / "state.json")
+    cache = Cache(path)
+    for user_id, weight in (("1", 10), ("2", 40), ("3", 90)):
+        cache.add_nomination_vote(user_id, KEY, weight)
+    save(cache)
+    loaded = Cache(path)
+    assert loaded.median_weight(KEY) == 40
+    assert loaded.weight_histograms[KEY].voters == {"1", "2", "3"}
+
+
+def application(app_id: int) -> tuple[Application, str]:
+    return Application.from_trusted({
+        "discord_id": "1", "app_id": app_id, "title": f"app {app_id}",
+        "body": "b", "app_key": f"key-{app_id}",
+    }), f"cid-{app_id}"
+
+
+def test_queue_positions_follow_inserts_pops_and_reloads(tmp_path):
+    path = str(tmp_path / "state.json")
+    cache = Cache(path)
+    rng = random.Random(1)
+    next_id = 0
+    for step in range(300):
+        queue = [app.app_id for app, _ in cache.render_applications_queue]
+        action = rng.random()
+        if action < 0.5 or not queue:
+            apps = [application(next_id + i) for i in range(rng.randint(1, 3))]
+            next_id += len(apps)
+            cache.insert_applications(rng.randint(0, len(queue)), apps)
+        elif action < 0.85:
+            cache.app_being_voted = cache.pop_next_application()
+        else:
+            cache._write(*cache._snapshot())
+            cache = Cache(path)
+        queue = [app.app_id for app, _ in cache.render_applications_queue]
+        for position, app_id in enumerate(queue, 1):
+            assert cache.queue_position(app_id) == position
+            assert cache.pending_app_id(f"key-{app_id}") == app_id
+        assert cache.queue_position(next_id) is None
+
+
+def test_pending_app_id(tmp_path):
+    cache = Cache(str(tmp_path / "state.json"))
+    cache.insert_applications(0, [application(3)])
+    assert cache.pending_app_id("3") == 3
+    assert cache.pending_app_id("4") is None
+    assert cache.pending_app_id("²") is None
+    cache.app_being_voted = cache.pop_next_application()
+    assert cache.queue_position(3) is None
+    assert cache.pending_app_id("key-3") == 3
@@ -0,0 +1,21 @@
+from comdao.helpers.domain_logic import paginate
+
+
+def test_pages_fit_the_limit():
+    lines = [f"line {i:03}" for i in range(100)]
+    pages = paginate(lines, page_chars=100, max_pages=50)
+    assert all(len(page) <= 100 for page in pages)
+    assert "\n".join(pages).split("\n") == lines
+
+
+def test_long_line_is_cut_to_the_page():
+    budget = 200 - 40
+    pages = paginate(["x" * 1000, "short", "short"], page_chars=200, max_pages=5)
+    assert pages == ["x" * budget, "short\nshort"]
+
+
+def test_lines_past_the_last_page_are_counted():
+    lines = ["y" * 50 for _ in range(20)]
+    pages = paginate(lines, page_chars=100, max_pages=2)
+    assert len(pages) == 2
+    assert pages[-1].endswith("…and 18 more")
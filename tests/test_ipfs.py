@@ -0,0 +1,69 @@
+import pytest
+
+from comdao.helpers.ipfs import ProposalRetriever
+from comdao.sim.fakes import IpfsGatewayStub
+
+DOCUMENT = {"discord_id": "1234", "title": "Vision", "body": "A module", "extra": [1, 2]}
+
+
+@pytest.fixture
+def gateways():
+    stubs = [IpfsGatewayStub(latency) for latency in (0.0, 0.05, 0.1)]
+    for stub in stubs:
+        stub.add("cid", DOCUMENT)
+        stub.start()
+    yield stubs
+    for stub in stubs:
+        stub.stop()
+
+
+def test_reads_only_the_proposal_fields(gateways):
+    retriever = ProposalRetriever("", [gateways[0].url], race_width=1)
+    assert retriever.get_proposal("cid") == {
+        "discord_id": "1234", "title": "Vision", "body": "A module"
+    }
+    assert retriever.get_proposal("missing") is None
+
+
+def test_ranking_decides_which_gateways_race(gateways):
+    slow, middle, fast = gateways[2], gateways[1], gateways[0]
+    retriever = ProposalRetriever("", [slow.url, middle.url, fast.url], race_width=1)
+    stats = {gateway.url: gateway for gateway in retriever.gateways}
+    # the fastest gateway has a poor record
+    stats[fast.url].record(0.01, ok=False)
+    stats[fast.url].record(0.01, ok=False)
+    stats[slow.url].record(0.1, ok=True)
+    stats[middle.url].record(0.5, ok=True)
+    assert retriever.ranked_gateways()[0].url == slow.url
+
+    assert retriever.get_proposal("cid") is not None
+    assert (slow.hits, middle.hits, fast.hits) == (1, 0, 0)
+
+
+def test_failing_gateway_drops_in_the_ranking(gateways):
+    empty = IpfsGatewayStub(0.0)
+    empty.start()
+    try:
+        retriever = ProposalRetriever("", [empty.url, gateways[0].url], race_width=1)
+        # both start with the same score, the empty one is listed first
+        assert retriever.get_proposal("cid") is not None
+        assert empty.hits == 1 and gateways[0].hits == 1
+        assert [gateway.url for gateway in retriever.ranked_gateways()] == [
+            gateways[0].url, empty.url
+        ]
+        retriever._documents.clear()
+        assert retriever.get_proposal("cid") is not None
+        assert empty.hits == 1 and gateways[0].hits == 2
+    finally:
+        empty.stop()
+
+
+def test_unreachable_local_node_backs_off(gateways):
+    # nothing listens on port 9, the daemon fails and is skipped afterwards
+    retriever = ProposalRetriever(
+        "/ip4/127.0.0.1/tcp/9/http", [gateways[0].url], race_width=1, local_timeout=0.5
+    )
+    assert retriever.get_proposal("cid") is not None
+    retriever._documents.clear()
+    assert retriever.get_proposal("missing") is None
+    assert not retriever.local_node_up
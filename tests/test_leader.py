@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from comdao.db.leader import LEASE_SAFETY, LeaderLease, NotLeader
+
+
+def lease(path, holder: str, seconds: float = 0.3) -> LeaderLease:
+    return LeaderLease(str(path / "lease.db"), holder, seconds)
+
+
+def test_one_holder_at_a_time(tmp_path):
+    first, second = lease(tmp_path, "first"), lease(tmp_path, "second")
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    # renewing keeps the term
+    assert first.try_acquire()
+    assert first.term == 1
+    assert first.holds_lease and not second.holds_lease
+
+
+def test_expired_lease_changes_hands(tmp_path):
+    first, second = lease(tmp_path, "first"), lease(tmp_path, "second")
+    assert first.try_acquire()
+    time.sleep(0.3 * LEASE_SAFETY)
+    # the holder stops acting before another replica can take over
+    assert not first.holds_lease
+    assert not second.try_acquire()
+    time.sleep(0.3 * (1 - LEASE_SAFETY) + 0.05)
+    assert second.try_acquire()
+    assert second.term == 2
+    assert not first.try_acquire()
+
+
+def test_release_hands_over_at_once(tmp_path):
+    first, second = lease(tmp_path, "first", 60), lease(tmp_path, "second", 60)
+    assert first.try_acquire()
+    first.release()
+    assert second.try_acquire()
+
+
+def test_leads_only_after_taking_over(tmp_path):
+    replica = lease(tmp_path, "replica")
+    calls = []
+
+    async def on_elected():
+        calls.append(replica.is_leader)
+        # a slow takeover, longer than the lease itself
+        await asyncio.sleep(0.5)
+        if len(calls) == 1:
+            raise ConnectionError("node unavailable")
+
+    async def scenario():
+        task = asyncio.create_task(replica.run(on_elected))
+        await asyncio.sleep(1.5)
+        task.cancel()
+
+    asyncio.run(scenario())
+    # the failed takeover was retried, the lease was renewed meanwhile
+    assert calls == [False, False]
+    assert replica.is_leader
+    replica.ensure_leader()
+
+
+def test_without_lease_file_always_leads():
+    replica = LeaderLease("", "replica")
+    assert replica.is_leader and replica.holds_lease
+    replica.ensure_leader()
+
+
+def test_not_leader_raises(tmp_path):
+    replica = lease(tmp_path, "replica")
+    with pytest.raises(NotLeader):
+        replica.ensure_leader()
@@ -0,0 +1,51 @@
+import json
+
+from comdao.db.cache import Cache
+from comdao.db.ratelimit import RateLimiter
+
+
+def test_burst_then_one_token_per_period():
+    limiter = RateLimiter(burst=2, period=10)
+    assert limiter.acquire("a", now=0) == 0
+    assert limiter.acquire("a", now=0) == 0
+    assert limiter.acquire("a", now=0) == 10
+    assert limiter.retry_after("a", now=4) == 6
+    assert limiter.acquire("a", now=10) == 0
+    assert limiter.acquire("a", now=10) == 10
+    # other users have their own bucket
+    assert limiter.acquire("b", now=10) == 0
+
+
+def test_retry_after_does_not_spend():
+    limiter = RateLimiter(burst=1, period=10)
+    limiter.take("a", now=0)
+    assert limiter.retry_after("a", now=5) == 5
+    assert limiter.retry_after("a", now=5) == 5
+    assert limiter.acquire("a", now=10) == 0
+
+
+def test_full_buckets_are_swept():
+    limiter = RateLimiter(burst=1, period=10)
+    for i in range(200):
+        limiter.take(str(i), now=i)
+    # every take past the threshold sweeps the buckets that refilled
+    assert len(limiter) < 200
+    limiter.sweep(now=1000)
+    assert len(limiter) == 0
+
+
+def test_saved_limits_never_hand_out_a_token_early():
+    limiter = RateLimiter(burst=1, period=10.5)
+    limiter.take("a")
+    saved = limiter.to_dict()
+    loaded = RateLimiter(burst=1, period=10.5)
+    loaded.load(json.loads(json.dumps(saved)))
+    assert loaded.retry_after("a") >= limiter.retry_after("a")
+
+
+def test_limits_survive_a_restart(tmp_path):
+    path = str(tmp_path / "state.json")
+    cache = Cache(path)
+    cache.rate_limits["module_request"].take("a")
+    cache._write(*cache._snapshot())
+    assert Cache(path).rate_limits["module_request"].retry_after("a") > 0
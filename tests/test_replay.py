@@ -0,0 +1,30 @@
+from comdao.sim.replay import CURATOR_APPLICATIONS, LEGIT_WHITELIST, replay_backend
+
+FIXTURE = {
+    "storage": {
+        CURATOR_APPLICATIONS: [
+            [0, {"id": 0, "user_id": "key", "data": "ipfs://cid", "status": "Pending"}]
+        ],
+        LEGIT_WHITELIST: [["other", 10]],
+    },
+    "documents": {"cid": {"discord_id": "1", "title": "t", "body": "b"}, "lost": None},
+    "calls": [],
+    "latency": {"query_map": 0.1, "compose_call": 6.0, "ipfs": 0.3},
+}
+
+
+def test_reads_and_extrinsics_use_their_own_recorded_latency():
+    chain, gateway = replay_backend(FIXTURE)
+    assert (chain.latency, chain.extrinsic_latency, gateway.latency) == (0.1, 6.0, 0.3)
+
+
+def test_given_latencies_override_the_recorded_ones():
+    chain, _ = replay_backend(FIXTURE, chain_latency=0.0, extrinsic_latency=0.5)
+    assert (chain.latency, chain.extrinsic_latency) == (0.0, 0.5)
+
+
+def test_fixture_seeds_the_chain_and_gateway():
+    chain, gateway = replay_backend(FIXTURE)
+    assert chain.applications[0]["user_id"] == "key"
+    assert chain.whitelist == {"other": 10}
+    assert set(gateway.documents) == {"cid"}
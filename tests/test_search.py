@@ -0,0 +1,53 @@
+from comdao.config.application import Application
+from comdao.db.search import SearchIndex, words
+
+KEY = "5GrwvaEF5zXb26Fz9rcQpDWS57CtERHpNehXCPcNoHGKutQY"
+
+
+def application(app_id: int, title: str, body: str) -> Application:
+    return Application.from_trusted({
+        "discord_id": "1234", "app_id": app_id,
+        "title": title, "body": body, "app_key": KEY,
+    })
+
+
+def index() -> SearchIndex:
+    search = SearchIndex()
+    search.add(application(1, "Vision v 2", "Code at github.com/acme/module-3"))
+    search.add(application(2, "Vision", "Code at github.com/acme/module-4"))
+    search.add(application(3, "Translation", "Code at gitlab.com/other/translator"))
+    return search
+
+
+def ids(results) -> list[int]:
+    return [app_id for app_id, _ in results]
+
+
+def test_words_skip_short_words():
+    assert words("Module-3 by ACME") == {"module", "by", "acme"}
+
+
+def test_short_query_words_are_ignored():
+    search = index()
+    assert ids(search.search("github.com/acme/module-3")) == [2, 1]
+    assert ids(search.search("vision v 2")) == [2, 1]
+
+
+def test_last_word_is_a_prefix():
+    search = index()
+    assert ids(search.search("acme mod")) == [2, 1]
+    assert ids(search.search("transl")) == [3]
+    assert ids(search.search("t")) == [3]
+
+
+def test_whole_word_matches_go_first():
+    search = SearchIndex()
+    search.add(application(1, "Vision", ""))
+    search.add(application(2, "Visionary", ""))
+    assert ids(search.search("vision")) == [1, 2]
+
+
+def test_all_words_must_match():
+    search = index()
+    assert ids(search.search("vision gitlab")) == []
+    assert search.search("") == []
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from comdao.helpers import substrate_interface
+from comdao.helpers.substrate_interface import StorageCache
+from comdao.sim.fakes import LocalChain
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = LocalChain()
+    for key in ("a", "b", "c"):
+        chain.whitelist[key] = 1
+    monkeypatch.setitem(substrate_interface._CLIENTS, False, chain.client(""))
+    return chain
+
+
+def keys(cache: StorageCache, view: str = "keys"):
+    return cache.read(
+        False, "GovernanceModule", "LegitWhitelist", view,
+        lambda entries: [key for key, _ in entries],
+    )
+
+
+def test_reads_within_the_ttl_are_served_from_memory(chain):
+    cache = StorageCache(ttl=60, max_items=100)
+    assert keys(cache) == ["a", "b", "c"]
+    chain.whitelist["d"] = 1
+    assert keys(cache) == ["a", "b", "c"]
+    assert chain.storage_pages == 1
+
+
+def test_map_is_read_again_only_when_the_head_moved(chain):
+    cache = StorageCache(ttl=0, max_items=100)
+    keys(cache)
+    # same head block, the cached view is reused
+    keys(cache)
+    assert chain.storage_pages == 1
+    chain.whitelist["d"] = 1
+    chain.block += 1
+    assert keys(cache) == ["a", "b", "c", "d"]
+    assert chain.storage_pages == 2
+
+
+def test_invalidate_ends_the_ttl(chain):
+    cache = StorageCache(ttl=60, max_items=100)
+    keys(cache)
+    chain.whitelist.pop("a")
+    chain.block += 1
+    cache.invalidate()
+    assert keys(cache) == ["b", "c"]
+
+
+def test_concurrent_reads_collapse_into_one(chain):
+    chain.latency = 0.2
+    cache = StorageCache(ttl=60, max_items=100)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: keys(cache), range(8)))
+    assert all(result == ["a", "b", "c"] for result in results)
+    assert chain.storage_pages == 1
+
+
+def test_least_recent_views_are_evicted(chain):
+    cache = StorageCache(ttl=0, max_items=4)
+    keys(cache, "first")
+    keys(cache, "second")
+    # 3 + 3 items is over the bound, the first view went
+    assert len(cache._entries) == 1
+    keys(cache, "second")
+    assert chain.storage_pages == 2
+    keys(cache, "first")
+    assert chain.storage_pages == 3
+
+
+def test_whitelist_is_a_copy(chain, monkeypatch):
+    monkeypatch.setattr(substrate_interface, "STORAGE_CACHE", StorageCache(60, 100))
+    first = substrate_interface.whitelist(False)
+    first.append("mine")
+    assert substrate_interface.whitelist(False) == ["a", "b", "c"]
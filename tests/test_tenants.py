@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from comdao.config import tenants as tenant_configs
+from comdao.db.tenants import TENANTS, Tenant, tenant_for
+
+
+def entry(name: str, guild_id: int, **extra) -> dict:
+    return {
+        "NAME": name, "GUILD_ID": guild_id, "REQUEST_CHANNEL_ID": 2,
+        "NOMINATOR_CHANNEL_ID": 3, "ROLE_ID": 4, "MNEMONIC": "words", **extra,
+    }
+
+
+def load(tmp_path, monkeypatch, entries: list[dict]):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps(entries))
+    monkeypatch.setattr(tenant_configs.DAO_TENANTS, "FILE", str(path))
+    return tenant_configs.load_tenant_configs()
+
+
+def test_tenants_file(tmp_path, monkeypatch):
+    configs = load(tmp_path, monkeypatch, [
+        entry("mainnet", 1), entry("testnet", 5, USE_TESTNET=True, STATE_FILE="t.json"),
+    ])
+    assert [config.STATE_FILE for config in configs] == ["./state-mainnet.json", "t.json"]
+    assert [config.USE_TESTNET for config in configs] == [False, True]
+
+
+def test_tenants_must_be_distinct(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="GUILD_ID"):
+        load(tmp_path, monkeypatch, [entry("a", 1), entry("b", 1)])
+
+
+def test_tenant_needs_a_mnemonic(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="mnemonic"):
+        load(tmp_path, monkeypatch, [entry("a", 1, MNEMONIC="")])
+
+
+def test_tenants_keep_their_own_state(tmp_path, monkeypatch):
+    configs = load(tmp_path, monkeypatch, [
+        entry("a", 1, STATE_FILE=str(tmp_path / "a.json")),
+        entry("b", 5, STATE_FILE=str(tmp_path / "b.json")),
+    ])
+    first, second = (Tenant(config) for config in configs)
+    first.cache.dao_applications.append(7)
+    first.cache.add_rejection_vote("1", 7)
+    assert second.cache.dao_applications == []
+    assert second.cache.rejection_counts == {}
+
+
+def test_tenant_for_guild():
+    tenant = next(iter(TENANTS.values()))
+    guild_id = tenant.config.GUILD_ID
+
+    class Guild:
+        id = guild_id
+
+    assert tenant_for(guild_id) is tenant
+    assert tenant_for(Guild()) is tenant
+    assert tenant_for(None) is None
+    assert tenant_for(guild_id + 1) is None